@@ -0,0 +1,212 @@
+"""
+Acta: the daemon's log pipeline and its queryable index.
+
+Worker threads only put log records on a queue. One listener thread
+writes them to Acta_Scriptoris.log and the console. It also indexes
+every record made on behalf of a patch in a small SQLite database,
+Acta_Index.db. Full pytest output never enters the log. It is stored
+as a gzip artifact under acta/, keyed by patch, and the log line only
+names the file. `scriptor acta` queries the index.
+"""
+import os
+import re
+import gzip
+import json
+import time
+import queue
+import sqlite3
+import logging
+import threading
+import contextlib
+import logging.handlers
+from datetime import datetime
+import typer
+
+app = typer.Typer(name="acta", help="Queries the Speculator's log index: outcomes, log lines and test output per patch.")
+SCRIBO_INBOX = os.path.expanduser("~/scribo_inbox")
+INDEX_NAME = "Acta_Index.db"
+ARTIFACTS_NAME = "acta"
+RETENTION = 30 * 86400  # seconds of index rows and artifacts kept
+FAILED = ("reverted", "quarantined")
+
+_context = threading.local()
+_listener = None
+_listeners = []
+_artifacts_dir = None
+
+@contextlib.contextmanager
+def patch_context(patch_paths):
+    """Attributes the records the current thread logs inside the block to patch_paths."""
+    previous = getattr(_context, 'patches', ())
+    _context.patches = tuple(os.path.basename(p) for p in patch_paths)
+    try:
+        yield
+    finally:
+        _context.patches = previous
+
+class ActaQueueHandler(logging.handlers.QueueHandler):
+    """Tags each record with the emitting thread's patches before it is queued."""
+    def prepare(self, record):
+        record = super().prepare(record)
+        if not hasattr(record, 'patches'):
+            record.patches = getattr(_context, 'patches', ())
+        return record
+
+class ActaIndex(logging.Handler):
+    """Runs on the listener thread: writes artifacts and indexes patch records."""
+    def __init__(self, inbox):
+        super().__init__()
+        self.path = os.path.join(inbox, INDEX_NAME)
+        self.artifacts_dir = os.path.join(inbox, ARTIFACTS_NAME)
+        self.db = None
+        self.pruned_hour = None
+
+    def emit(self, record):
+        patches = getattr(record, 'patches', ())
+        output = getattr(record, 'output', None)
+        artifact = getattr(record, 'artifact', None)
+        try:
+            if output is not None and artifact:
+                with gzip.open(artifact, 'wt', encoding='utf-8', compresslevel=6) as f:
+                    f.write(output)
+            if not patches:
+                return
+            if self.db is None:
+                self.db = open_index(self.path)
+            hour = int(time.time() // 3600)
+            if hour != self.pruned_hour:
+                self.pruned_hour = hour  # Retention is enforced once an hour.
+                prune(self.db, self.artifacts_dir)
+            with self.db:
+                self.db.executemany("INSERT INTO acta VALUES (?, ?, ?, ?, ?, ?)", [
+                    (record.created, patch, record.levelname, getattr(record, 'status', None),
+                     record.getMessage(), artifact) for patch in patches])
+        except Exception:
+            self.handleError(record)
+
+def open_index(path):
+    db = sqlite3.connect(path, timeout=5)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.executescript("""
+        CREATE TABLE IF NOT EXISTS acta (
+            ts REAL, patch TEXT, level TEXT, status TEXT, message TEXT, artifact TEXT);
+        CREATE INDEX IF NOT EXISTS acta_patch ON acta (patch, ts);
+        CREATE INDEX IF NOT EXISTS acta_status ON acta (status, ts) WHERE status IS NOT NULL;
+    """)
+    return db
+
+def prune(db, artifacts_dir):
+    cutoff = time.time() - RETENTION
+    with db:
+        db.execute("DELETE FROM acta WHERE ts < ?", (cutoff,))
+    if os.path.isdir(artifacts_dir):
+        for entry in os.scandir(artifacts_dir):
+            if entry.name.endswith('.log.gz') and entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+
+def start(inbox, handlers):
+    """
+    Routes the root logger through a queue: handlers (and the index) run
+    on one listener thread, so logging never blocks a worker on disk I/O.
+    """
+    global _listener, _artifacts_dir
+    _artifacts_dir = os.path.join(inbox, ARTIFACTS_NAME)
+    os.makedirs(_artifacts_dir, exist_ok=True)
+    records = queue.SimpleQueue()
+    _listener = logging.handlers.QueueListener(records, ActaIndex(inbox), *handlers, respect_handler_level=True)
+    _listener.start()
+    _listeners.append(_listener)
+    logging.getLogger().addHandler(ActaQueueHandler(records))
+
+def queue_logger(logger, handlers):
+    """Moves a logger's handlers onto a listener thread of their own, like the root logger's."""
+    records = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(records, *handlers, respect_handler_level=True)
+    listener.start()
+    _listeners.append(listener)
+    logger.addHandler(logging.handlers.QueueHandler(records))
+
+def stop():
+    """Drains the queues and stops the listeners."""
+    global _listener
+    while _listeners:
+        _listeners.pop().stop()
+    _listener = None
+
+def log_output(summary, output):
+    """
+    Logs an error with a long output attached. With the pipeline running,
+    the output goes to a gzip artifact named after the current patch and
+    only its path is logged; otherwise it is logged inline.
+    """
+    if _listener is None:
+        logging.error(f"{summary}\n{output}")
+        return
+    patches = getattr(_context, 'patches', ()) or ('unattributed',)
+    stem = re.sub(r'[^\w.-]', '_', os.path.splitext(patches[0])[0])
+    artifact = os.path.join(_artifacts_dir, f"{stem}-{time.strftime('%Y%m%d-%H%M%S')}-{time.time_ns() % 10**9:09d}.log.gz")
+    logging.error(f"{summary} (full output: {artifact})", extra={'output': output, 'artifact': artifact})
+
+def parse_since(value):
+    """Accepts a duration ('90s', '30m', '2h', '7d') or an ISO date/time; returns an epoch."""
+    match = re.fullmatch(r'(\d+(?:\.\d+)?)([smhd])', value.strip())
+    if match:
+        return time.time() - float(match.group(1)) * {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}[match.group(2)]
+    return datetime.fromisoformat(value.strip()).timestamp()
+
+def stamp(ts):
+    return time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(ts))
+
+@app.callback(invoke_without_command=True)
+def query(
+    patch: str = typer.Option(None, "--patch", help="Show every indexed log line and artifact of one patch (file name, '.patch' optional)."),
+    since: str = typer.Option(None, "--since", help="Only entries newer than a duration ('30m', '2h', '7d') or an ISO date/time."),
+    status: str = typer.Option(None, "--status", help="Only outcomes with this status: applied, reverted, quarantined, or failed (either of the last two)."),
+    output: bool = typer.Option(False, "--output", help="With --patch, also print the stored test output."),
+    limit: int = typer.Option(50, "--limit", min=1, help="Maximum number of entries shown."),
+    as_json: bool = typer.Option(False, "--json", help="Print the entries as JSON."),
+    inbox: str = typer.Option(SCRIBO_INBOX, "--inbox", help="The Speculator's inbox.")
+):
+    """
+    Lists recent patch outcomes, or the full record of one patch.
+    """
+    path = os.path.join(inbox, INDEX_NAME)
+    if not os.path.exists(path):
+        print(f"Acta: No index at '{path}' yet.")
+        raise typer.Exit(code=1)
+    try:
+        cutoff = parse_since(since) if since else 0
+    except ValueError:
+        print(f"Acta: Cannot read --since '{since}'.")
+        raise typer.Exit(code=2)
+    db = sqlite3.connect(f"file:{path}?mode=ro", uri=True, timeout=5)
+    clauses, params = ["ts >= ?"], [cutoff]
+    if patch:
+        clauses.append("patch IN (?, ?)")
+        params += [patch, patch if patch.endswith('.patch') else patch + '.patch']
+    if status:
+        statuses = FAILED if status == 'failed' else (status,)
+        clauses.append(f"status IN ({', '.join('?' * len(statuses))})")
+        params += list(statuses)
+    elif not patch:
+        clauses.append("status IS NOT NULL")
+    rows = db.execute(f"SELECT ts, patch, level, status, message, artifact FROM acta WHERE {' AND '.join(clauses)} "
+                      f"ORDER BY ts DESC LIMIT ?", params + [limit]).fetchall()[::-1]
+    entries = [dict(zip(("ts", "patch", "level", "status", "message", "artifact"), row)) for row in rows]
+    if as_json:
+        print(json.dumps(entries, indent=2))
+        return
+    if not patch:
+        for entry in entries:
+            print(f"{stamp(entry['ts'])}  {entry['status']:<11}  {entry['patch']}")
+        return
+    for entry in entries:
+        print(f"{stamp(entry['ts'])}  {entry['level']:<8} {entry['message']}")
+    if output:
+        for artifact in dict.fromkeys(e['artifact'] for e in entries if e['artifact']):
+            print(f"\n--- {artifact} ---")
+            try:
+                with gzip.open(artifact, 'rt', encoding='utf-8') as f:
+                    print(f.read())
+            except OSError as e:
+                print(f"Acta: Cannot read artifact: {e}")
@@ -0,0 +1,331 @@
+"""
+Certamen: benchmarks for the patch pipeline.
+
+Builds throwaway synthetic projects and a stream of patches against them,
+then times each stage on its own (Comparator, Perfector, Ornator) and the
+whole speculator pipeline in-process (Dispatcher, Operarius pool, Probator).
+The report is JSON, so two runs, e.g. before and after an upgrade, can be
+compared mechanically:
+
+    {"config": {...}, "stages": {"perfector": {"count": 200, "p50": 0.0009,
+     "p95": 0.0012, "p99": 0.002, "mean": 0.001, "per_second": 950.3}, ...},
+     "pipeline": {"patches": 200, "outcomes": {"applied": 200}, ...}}
+"""
+import io
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import logging
+import platform
+import tempfile
+import subprocess
+import contextlib
+import typer
+from . import comparator, speculator
+from .perfector import perfice_resarcio, BACKUP_SUFFIX
+from .ornator import orna, forget_clean
+from .mensura import spans_log
+from .tabularium import Tabularium
+
+app = typer.Typer(name="bench", help="Benchmarks the patch pipeline on synthetic projects.")
+
+TEST_TEMPLATE = """import time
+
+from pkg import {module}
+
+
+def test_{module}():
+    time.sleep({seconds})
+    assert {module}.f_0() is not None
+"""
+
+# Modules 'scriptor compara' must not import: the editor hooks run it on every save.
+HEAVY_MODULES = {"watchdog", "paramiko", "black", "pytest"}
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, min(len(sorted_values), round(fraction * len(sorted_values) + 0.5)))
+    return sorted_values[rank - 1]
+
+def summarize(samples, wall=None):
+    """Returns count, p50/p95/p99 and mean latency (seconds) and, given wall time, throughput."""
+    values = sorted(samples)
+    summary = {
+        "count": len(values),
+        "p50": percentile(values, 0.50),
+        "p95": percentile(values, 0.95),
+        "p99": percentile(values, 0.99),
+        "mean": sum(values) / len(values) if values else None,
+    }
+    summary = {key: round(value, 6) if isinstance(value, float) else value for key, value in summary.items()}
+    total = wall if wall is not None else sum(values)
+    summary["per_second"] = round(len(values) / total, 3) if total else None
+    return summary
+
+def module_source(lines):
+    """A black- and ruff-clean module of about `lines` lines: small functions, 4 lines each."""
+    return "\n\n".join(f"def f_{i}():\n    return {i}\n" for i in range(max(1, lines // 4)))
+
+def build_projects(workdir, projects, files, lines, test_seconds):
+    """Creates the synthetic projects. Returns {project root: [module paths]}."""
+    layout = {}
+    for p in range(projects):
+        root = os.path.join(workdir, f"project_{p}")
+        os.makedirs(os.path.join(root, "pkg"))
+        os.makedirs(os.path.join(root, "tests"))
+        with open(os.path.join(root, "pyproject.toml"), "w") as f:
+            f.write(f'[project]\nname = "bench-{p}"\nversion = "0"\n\n'
+                    '[tool.pytest.ini_options]\npythonpath = ["."]\n')
+        open(os.path.join(root, "pkg", "__init__.py"), "w").close()
+        modules = []
+        for m in range(files):
+            module = f"mod_{m}"
+            path = os.path.join(root, "pkg", f"{module}.py")
+            with open(path, "w") as f:
+                f.write(module_source(lines))
+            with open(os.path.join(root, "tests", f"test_{module}.py"), "w") as f:
+                f.write(TEST_TEMPLATE.format(module=module, seconds=test_seconds))
+            modules.append(path)
+        layout[root] = modules
+    return layout
+
+def mutate(source, hunks, serial, rng):
+    """Changes `hunks` return lines spread through the file, keeping it formatted."""
+    lines = source.splitlines(keepends=True)
+    returns = [i for i, line in enumerate(lines) if line.startswith("    return ")]
+    for i in rng.sample(returns, min(hunks, len(returns))):
+        value = lines[i].split("    return ")[1].split(" + ")[0].strip()
+        lines[i] = f"    return {value} + {serial}\n"
+    return "".join(lines)
+
+def read(path):
+    with open(path) as f:
+        return f.read()
+
+def generate_stream(layout, originals, patches, hunks, targets, inbox, scratch, seed):
+    """
+    Writes `patches` patches to inbox with the Comparator, each touching
+    `targets` files of one project and building on the previous patches,
+    so the stream applies cleanly in order. Returns (patch paths, compara
+    latencies). The project files are left as they were.
+    """
+    rng = random.Random(seed)
+    current = dict(originals)
+    roots = sorted(layout)
+    stream, timings = [], []
+    inbox_before, comparator.SCRIBO_INBOX = comparator.SCRIBO_INBOX, scratch
+    try:
+        for serial in range(1, patches + 1):
+            root = roots[serial % len(roots)]
+            chosen = rng.sample(layout[root], min(targets, len(layout[root])))
+            sections = []
+            for target in chosen:
+                with open(target, "w") as f:
+                    f.write(current[target])
+                current[target] = mutate(current[target], hunks, serial, rng)
+                revised = os.path.join(scratch, "revised.py")
+                with open(revised, "w") as f:
+                    f.write(current[target])
+                start = time.perf_counter()
+                patch_file = comparator.generate_patch_file(target, revised)
+                timings.append(time.perf_counter() - start)
+                sections.append(read(patch_file))
+                os.remove(patch_file)
+            patch_path = os.path.join(inbox, f"{serial:06d}-bench.patch")
+            with open(patch_path, "w") as f:
+                f.write("".join(sections))
+            stream.append(patch_path)
+    finally:
+        comparator.SCRIBO_INBOX = inbox_before
+        restore(originals)
+    return stream, timings
+
+def restore(originals):
+    for path, content in originals.items():
+        with open(path, "w") as f:
+            f.write(content)
+        if os.path.exists(path + BACKUP_SUFFIX):
+            os.remove(path + BACKUP_SUFFIX)
+
+def bench_stages(stream, originals):
+    """Applies the stream with the Perfector and formats each target with the Ornator, timing both."""
+    applying, formatting = [], []
+    forget_clean()
+    for patch_path in stream:
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            targets = perfice_resarcio(patch_path)
+            applying.append(time.perf_counter() - start)
+        if not targets:
+            raise RuntimeError(f"'{os.path.basename(patch_path)}' did not apply; the synthetic stream is inconsistent.")
+        for target in targets:
+            start = time.perf_counter()
+            orna(target)
+            formatting.append(time.perf_counter() - start)
+    restore(originals)
+    return applying, formatting
+
+def bench_pipeline(stream, inbox, workers, burst, coalesce, impacted, warm):
+    """
+    Feeds the stream to an in-process Dispatcher and Operarius pool at
+    `burst` patches per second (0: all at once) and collects their spans.
+    """
+    spans, finished, put_at = [], {}, {}
+    forget_clean()  # The stage run formatted these exact contents already.
+
+    class Collector(logging.Handler):
+        def emit(self, record):
+            span = json.loads(record.getMessage())
+            spans.append(span)
+            for name in span["outcomes"]:
+                finished[name] = record.created
+
+    collector = Collector()
+    spans_log.addHandler(collector)
+    spans_log.setLevel(logging.INFO)
+    quarantine_dir = speculator.QUARANTINE_DIR
+    speculator.QUARANTINE_DIR = os.path.join(inbox, "quarantine")
+    os.makedirs(speculator.QUARANTINE_DIR, exist_ok=True)
+    dispatcher = speculator.Dispatcher(journal=Tabularium(inbox))
+    pool = [speculator.Operarius(dispatcher, name=f"Operarius-{i + 1}", impacted=impacted, warm=warm, coalesce=coalesce)
+            for i in range(workers)]
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            for worker in pool:
+                worker.start()
+            start = time.time()
+            for i, patch_path in enumerate(stream):
+                if burst:
+                    time.sleep(max(0.0, start + i / burst - time.time()))
+                put_at[os.path.basename(patch_path)] = time.time()
+                dispatcher.put(patch_path)
+            while dispatcher.depth():
+                time.sleep(0.005)
+            wall = time.time() - start
+            dispatcher.stop(len(pool))
+            for worker in pool:
+                worker.join()
+    finally:
+        spans_log.removeHandler(collector)
+        speculator.QUARANTINE_DIR = quarantine_dir
+    outcomes = {}
+    for span in spans:
+        for outcome in span["outcomes"].values():
+            outcomes[outcome] = outcomes.get(outcome, 0) + 1
+    stages = {}
+    for span in spans:
+        stages.setdefault("queue_wait", []).append(span["queue_wait"])
+        for name, seconds in span["stages"].items():
+            stages.setdefault(name, []).append(seconds)
+    return {
+        "patches": len(stream),
+        "spans": len(spans),
+        "wall": wall,
+        "per_second": len(stream) / wall if wall else None,
+        "outcomes": outcomes,
+        "end_to_end": summarize([finished[name] - put_at[name] for name in finished], wall),
+        "stages": {name: summarize(samples) for name, samples in sorted(stages.items())},
+    }
+
+def measure_startup(runs):
+    """
+    Times 'scriptor compara --help' in fresh interpreters and lists any
+    HEAVY_MODULES it imported, to catch CLI startup regressions.
+    """
+    package_parent = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [package_parent, os.environ.get("PYTHONPATH")])))
+    command = [sys.executable, "-m", "scriptor.main", "compara", "--help"]
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(command, env=env, capture_output=True, check=True)
+        samples.append(time.perf_counter() - start)
+    trace = subprocess.run([sys.executable, "-X", "importtime"] + command[1:], env=env, capture_output=True, text=True)
+    imported = {line.rsplit("|", 1)[-1].strip().split(".")[0]
+                for line in trace.stderr.splitlines() if line.startswith("import time:")}
+    return {"command": "scriptor compara --help", **summarize(samples), "heavy_imports": sorted(imported & HEAVY_MODULES)}
+
+@app.callback(invoke_without_command=True)
+def main(
+    projects: int = typer.Option(1, "--projects", min=1, help="Synthetic projects (one dispatcher lane each)."),
+    files: int = typer.Option(4, "--files", min=1, help="Modules per project."),
+    lines: int = typer.Option(400, "--lines", min=4, help="Approximate lines per module."),
+    hunks: int = typer.Option(3, "--hunks", min=1, help="Hunks per target file in each patch."),
+    targets: int = typer.Option(1, "--targets", min=1, help="Target files per patch (more than one makes bundles)."),
+    patches: int = typer.Option(50, "--patches", "-n", min=1, help="Patches in the stream."),
+    burst: float = typer.Option(0.0, "--burst", min=0.0, help="Pipeline arrival rate in patches per second (0: all at once)."),
+    test_seconds: float = typer.Option(0.0, "--test-seconds", min=0.0, help="How long each synthetic test sleeps."),
+    workers: int = typer.Option(1, "--workers", "-w", min=1, help="Operarius workers for the pipeline run."),
+    coalesce: bool = typer.Option(False, "--coalesce", help="Run the pipeline with coalescing."),
+    impacted: bool = typer.Option(False, "--impacted", help="Run the pipeline with impacted-tests selection."),
+    warm: bool = typer.Option(False, "--warm", help="Run the pipeline with warm Probators."),
+    pipeline: bool = typer.Option(True, "--pipeline/--no-pipeline", help="Include the full in-process pipeline run."),
+    seed: int = typer.Option(0, "--seed", help="Random seed for the patch stream."),
+    startup_runs: int = typer.Option(10, "--startup-runs", min=0, help="Times to start 'scriptor compara' for the startup check (0: skip)."),
+    max_startup: float = typer.Option(None, "--max-startup", help="Fail if the median 'scriptor compara' startup exceeds this many seconds."),
+    output: str = typer.Option(None, "--output", "-o", help="Write the JSON report here instead of stdout."),
+    keep: bool = typer.Option(False, "--keep", help="Keep the synthetic projects and inbox for inspection."),
+):
+    """
+    Benchmarks the Comparator, Perfector, Ornator and the full speculator
+    pipeline on synthetic projects, and reports p50/p95/p99 latency and
+    throughput per stage as JSON. Also checks that the CLI still starts
+    fast and lazily; exits 1 if --max-startup is exceeded or 'compara'
+    imports any heavy module.
+    """
+    workdir = tempfile.mkdtemp(prefix="scriptor-bench-")
+    try:
+        inbox = os.path.join(workdir, "inbox")
+        scratch = os.path.join(workdir, "scratch")
+        os.makedirs(inbox)
+        os.makedirs(scratch)
+        layout = build_projects(workdir, projects, files, lines, test_seconds)
+        originals = {path: read(path) for modules in layout.values() for path in modules}
+        print(f"Certamen: Generating {patches} patch(es) across {projects} project(s)...", file=sys.stderr)
+        stream, diffing = generate_stream(layout, originals, patches, hunks, targets, inbox, scratch, seed)
+        print("Certamen: Timing Perfector and Ornator...", file=sys.stderr)
+        applying, formatting = bench_stages(stream, originals)
+        report = {
+            "config": {
+                "projects": projects, "files": files, "lines": lines, "hunks": hunks,
+                "targets": targets, "patches": patches, "burst": burst,
+                "test_seconds": test_seconds, "workers": workers, "coalesce": coalesce,
+                "impacted": impacted, "warm": warm, "seed": seed,
+            },
+            "environment": {"python": platform.python_version(), "platform": platform.platform()},
+            "stages": {
+                "compara": summarize(diffing),
+                "perfector": summarize(applying),
+                "ornator": summarize(formatting),
+            },
+        }
+        if startup_runs:
+            print("Certamen: Timing CLI startup...", file=sys.stderr)
+            report["startup"] = measure_startup(startup_runs)
+        if pipeline:
+            print(f"Certamen: Running the pipeline with {workers} worker(s)...", file=sys.stderr)
+            report["pipeline"] = bench_pipeline(stream, inbox, workers, burst, coalesce, impacted, warm)
+    finally:
+        if keep:
+            print(f"Certamen: Kept the synthetic workspace at {workdir}", file=sys.stderr)
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+        if warm:
+            speculator.probator_tool.stop_warm_runners()
+    text = json.dumps(report, indent=2)
+    if output:
+        with open(output, "w") as f:
+            f.write(text + "\n")
+        print(f"Certamen: Report written to {output}", file=sys.stderr)
+    else:
+        print(text)
+    startup = report.get("startup")
+    if startup and (startup["heavy_imports"] or (max_startup is not None and startup["p50"] > max_startup)):
+        print(f"Certamen: CLI startup regression: median {startup['p50']:.3f}s, "
+              f"heavy imports: {', '.join(startup['heavy_imports']) or 'none'}.", file=sys.stderr)
+        raise typer.Exit(code=1)
@@ -1,47 +1,429 @@
 import typer
 import os
 import sys
+import shutil
 import difflib
+import hashlib
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
-from .probator_tool import find_project_root
+from .probator_tool import find_project_root, IGNORED_DIRS
+from .perfector import NO_NEWLINE, BACKUP_SUFFIX
+from .ordo import parse_priority, parse_deadline
 
-app = typer.Typer(name="compara", help="Generates a Scriptor patch file by comparing two files.")
+app = typer.Typer(name="compara", help="Generates a Scriptor patch file by comparing two files or two directory trees.")
+SCRIBO_INBOX = os.path.expanduser("~/scribo_inbox")
 
-# (The generate_patch_file function is unchanged)
-def generate_patch_file(original_file_path, revised_file_path):
-    # ... (all the logic from the last correct version of this function)
-    SCRIBO_INBOX = os.path.expanduser("~/scribo_inbox")
-    os.makedirs(SCRIBO_INBOX, exist_ok=True)
+# Above this many lines (original + revised) the patience matcher replaces
+# difflib.SequenceMatcher, whose worst case is quadratic.
+LARGE_DIFF_LINES = 5000
+# A large gap with no anchors gets a shortest edit script if it needs at
+# most MAX_EDITS edits, and SequenceMatcher over windows of FALLBACK_WINDOW
+# lines per side otherwise.
+MAX_EDITS = 1000
+FALLBACK_WINDOW = 500
+CHUNK_SIZE = 1 << 20
+
+def files_identical(path_a, path_b):
+    """Cheap identity check: different sizes, or the first differing chunk, end it early."""
+    if os.path.getsize(path_a) != os.path.getsize(path_b):
+        return False
+    with open(path_a, 'rb') as f_a, open(path_b, 'rb') as f_b:
+        while True:
+            chunk_a, chunk_b = f_a.read(CHUNK_SIZE), f_b.read(CHUNK_SIZE)
+            if chunk_a != chunk_b:
+                return False
+            if not chunk_a:
+                return True
+
+def file_sha256(path):
+    """The file's sha256, read in CHUNK_SIZE blocks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def anchor_pairs(where_a, where_b):
+    """
+    Pairs the occurrences of the rarest lines that occur equally often in
+    both regions, in order. Usually these are the unique lines.
+    """
+    counts = [len(js) for line, js in where_b.items() if len(where_a[line]) == len(js)]
+    if not counts:
+        return []
+    rarest = min(counts)
+    return sorted(pair for line, js in where_b.items() if len(js) == rarest == len(where_a[line])
+                  for pair in zip(where_a[line], js))
+
+def myers_matches(a, b, alo, ahi, blo, bhi):
+    """
+    Returns the matched line pairs of a shortest edit script between two
+    regions (Myers' O(ND) algorithm), or None if it needs more than
+    MAX_EDITS edits. Cheap when few lines changed, however repetitive.
+    """
+    n, m = ahi - alo, bhi - blo
+    v, trace = {1: 0}, []
+    for d in range(min(n + m, MAX_EDITS) + 1):
+        trace.append(dict(v))
+        for k in range(-d, d + 1, 2):
+            x = v[k + 1] if k == -d or (k != d and v[k - 1] < v[k + 1]) else v[k - 1] + 1
+            y = x - k
+            while x < n and y < m and a[alo + x] == b[blo + y]:
+                x, y = x + 1, y + 1
+            v[k] = x
+            if x >= n and y >= m:
+                break
+        else:
+            continue
+        break
+    else:
+        return None
+    matches = []
+    for d in range(len(trace) - 1, -1, -1):
+        v, k = trace[d], x - y
+        prev_k = k + 1 if k == -d or (k != d and v[k - 1] < v[k + 1]) else k - 1
+        prev_x = v[prev_k]
+        while x > prev_x and y > prev_x - prev_k:
+            x, y = x - 1, y - 1
+            matches.append((alo + x, blo + y))
+        x, y = prev_x, prev_x - prev_k
+    return matches[::-1]
+
+def windowed_matches(a, b, alo, ahi, blo, bhi):
+    """
+    Yields matched line pairs of a region from SequenceMatcher. A region
+    too large for one matcher is walked in windows of FALLBACK_WINDOW lines
+    per side. Only the first half of each window's matches is kept before
+    the next window starts, so the alignment can follow insertions.
+    """
+    while alo < ahi and blo < bhi:
+        last = (ahi - alo) * (bhi - blo) <= LARGE_DIFF_LINES * 100
+        a_end, b_end = (ahi, bhi) if last else (min(ahi, alo + FALLBACK_WINDOW), min(bhi, blo + FALLBACK_WINDOW))
+        matcher = difflib.SequenceMatcher(None, a[alo:a_end], b[blo:b_end], autojunk=False)
+        limit_a, limit_b = alo + FALLBACK_WINDOW // 2, blo + FALLBACK_WINDOW // 2
+        next_a, next_b = limit_a, limit_b
+        for i, j, n in matcher.get_matching_blocks():
+            for k in range(n):
+                if not last and (alo + i + k >= limit_a or blo + j + k >= limit_b):
+                    break
+                yield alo + i + k, blo + j + k
+                next_a, next_b = alo + i + k + 1, blo + j + k + 1
+        if last:
+            return
+        alo, blo = next_a, next_b
+
+def patience_matching_blocks(a, b):
+    """
+    Yields (i, j, 1) for each matched line pair, in order, using patience
+    diff: lines that occur exactly once on both sides anchor the match (the
+    longest increasing run of them), and the gaps between anchors are
+    solved recursively. Where no line is unique, the rarest lines that
+    occur equally often on both sides anchor instead, as in histogram diff.
+    Small gaps without any such line fall back to SequenceMatcher; large
+    ones to a bounded Myers diff, then to SequenceMatcher over windows.
+    """
+    stack = [(0, len(a), 0, len(b))]
+    while stack:
+        item = stack.pop()
+        if len(item) == 2:
+            yield item[0], item[1], 1
+            continue
+        alo, ahi, blo, bhi = item
+        while alo < ahi and blo < bhi and a[alo] == b[blo]:
+            yield alo, blo, 1
+            alo += 1
+            blo += 1
+        suffix = []
+        while alo < ahi and blo < bhi and a[ahi - 1] == b[bhi - 1]:
+            ahi -= 1
+            bhi -= 1
+            suffix.append((ahi, bhi))
+        stack.extend(suffix)
+        if alo == ahi or blo == bhi:
+            continue
+        where_a, where_b = {}, {}
+        for i in range(alo, ahi):
+            where_a.setdefault(a[i], []).append(i)
+        for j in range(blo, bhi):
+            if b[j] in where_a:
+                where_b.setdefault(b[j], []).append(j)
+        pairs = anchor_pairs(where_a, where_b)
+        if not pairs:
+            matches = myers_matches(a, b, alo, ahi, blo, bhi) if (ahi - alo) * (bhi - blo) > LARGE_DIFF_LINES * 100 else None
+            if matches is None:
+                matches = list(windowed_matches(a, b, alo, ahi, blo, bhi))
+            stack.extend(reversed(matches))
+            continue
+        # Patience sorting: longest increasing subsequence of b-indices.
+        tails, links = [], {}
+        for i, j in pairs:
+            lo, hi = 0, len(tails)
+            while lo < hi:
+                mid = (lo + hi) // 2
+                if tails[mid][1] < j:
+                    lo = mid + 1
+                else:
+                    hi = mid
+            links[(i, j)] = tails[lo - 1] if lo else None
+            if lo == len(tails):
+                tails.append((i, j))
+            else:
+                tails[lo] = (i, j)
+        anchors, node = [], tails[-1]
+        while node:
+            anchors.append(node)
+            node = links[node]
+        anchors.reverse()
+        # Pushed in reverse so that regions and anchors pop in order.
+        work, prev_i, prev_j = [], alo, blo
+        for i, j in anchors:
+            work.append((prev_i, i, prev_j, j))
+            work.append((i, j))
+            prev_i, prev_j = i + 1, j + 1
+        work.append((prev_i, ahi, prev_j, bhi))
+        stack.extend(reversed(work))
+
+def patience_opcodes(a, b):
+    """Returns SequenceMatcher-style opcodes computed by patience_matching_blocks."""
+    opcodes, i, j = [], 0, 0
+    for ai, bj, _ in list(patience_matching_blocks(a, b)) + [(len(a), len(b), 0)]:
+        if i < ai and j < bj:
+            opcodes.append(('replace', i, ai, j, bj))
+        elif i < ai:
+            opcodes.append(('delete', i, ai, j, bj))
+        elif j < bj:
+            opcodes.append(('insert', i, ai, j, bj))
+        if ai < len(a) or bj < len(b):
+            if opcodes and opcodes[-1][0] == 'equal':
+                tag, i1, _, j1, _ = opcodes[-1]
+                opcodes[-1] = ('equal', i1, ai + 1, j1, bj + 1)
+            else:
+                opcodes.append(('equal', ai, ai + 1, bj, bj + 1))
+        i, j = ai + 1, bj + 1
+    return opcodes
+
+def grouped_opcodes(opcodes, n=3):
+    """Same grouping as difflib.SequenceMatcher.get_grouped_opcodes, over precomputed opcodes."""
+    if not opcodes:
+        opcodes = [('equal', 0, 1, 0, 1)]
+    if opcodes[0][0] == 'equal':
+        tag, i1, i2, j1, j2 = opcodes[0]
+        opcodes[0] = tag, max(i1, i2 - n), i2, max(j1, j2 - n), j2
+    if opcodes[-1][0] == 'equal':
+        tag, i1, i2, j1, j2 = opcodes[-1]
+        opcodes[-1] = tag, i1, min(i2, i1 + n), j1, min(j2, j1 + n)
+    group = []
+    for tag, i1, i2, j1, j2 in opcodes:
+        if tag == 'equal' and i2 - i1 > 2 * n:
+            group.append((tag, i1, min(i2, i1 + n), j1, min(j2, j1 + n)))
+            yield group
+            group = []
+            i1, j1 = max(i1, i2 - n), max(j1, j2 - n)
+        group.append((tag, i1, i2, j1, j2))
+    if group and not (len(group) == 1 and group[0][0] == 'equal'):
+        yield group
+
+def format_range(start, stop):
+    length = stop - start
+    beginning = start + 1
+    if length == 1:
+        return f"{beginning}"
+    if not length:
+        beginning -= 1
+    return f"{beginning},{length}"
+
+def unified_diff(a, b, fromfile, tofile):
+    """
+    Generates unified diff lines like difflib.unified_diff, marking a last
+    line without a newline the way GNU diff does. Large inputs are matched
+    with the patience algorithm instead of SequenceMatcher.
+    """
+    for line in diff_lines(a, b, fromfile, tofile):
+        if line.endswith('\n'):
+            yield line
+        else:
+            yield line + '\n' + NO_NEWLINE + '\n'
+
+def diff_lines(a, b, fromfile, tofile):
+    if len(a) + len(b) <= LARGE_DIFF_LINES:
+        yield from difflib.unified_diff(a, b, fromfile=fromfile, tofile=tofile)
+        return
+    started = False
+    for group in grouped_opcodes(patience_opcodes(a, b)):
+        if not started:
+            started = True
+            yield f"--- {fromfile}\n"
+            yield f"+++ {tofile}\n"
+        first, last = group[0], group[-1]
+        yield f"@@ -{format_range(first[1], last[2])} +{format_range(first[3], last[4])} @@\n"
+        for tag, i1, i2, j1, j2 in group:
+            if tag == 'equal':
+                for line in a[i1:i2]:
+                    yield ' ' + line
+                continue
+            for line in a[i1:i2]:
+                yield '-' + line
+            for line in b[j1:j2]:
+                yield '+' + line
+
+def write_section(f, original_file_path, revised_file_path, fields=None):
+    """
+    Writes one '--- target:' section (header plus unified diff) to f. The
+    header names the sha256 of the original ('--- base:') and any extra
+    fields, such as priority and deadline. Returns False, writing nothing,
+    when the files are identical.
+    """
+    if files_identical(original_file_path, revised_file_path):
+        return False
     with open(original_file_path, 'r') as f_orig, open(revised_file_path, 'r') as f_rev:
         original_lines = f_orig.readlines()
         revised_lines = f_rev.readlines()
     if original_lines == revised_lines:
-        return None
+        return False
     project_root = find_project_root(os.path.dirname(original_file_path))
     if not project_root:
         project_root = os.path.dirname(original_file_path)
     relative_path = os.path.relpath(original_file_path, project_root)
-    diff_content = "".join(list(difflib.unified_diff(
+    f.write(f"--- target: {os.path.abspath(original_file_path)}\n")
+    f.write(f"--- base: {file_sha256(original_file_path)}\n")
+    for name, value in (fields or {}).items():
+        f.write(f"--- {name}: {value}\n")
+    f.writelines(unified_diff(
         original_lines, revised_lines,
         fromfile=f"a/{relative_path}", tofile=f"b/{relative_path}"
-    )))
+    ))
+    return True
+
+def generate_patch_file(original_file_path, revised_file_path, fields=None):
+    os.makedirs(SCRIBO_INBOX, exist_ok=True)
     timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
     patch_filename = f"{timestamp}-{os.path.splitext(os.path.basename(original_file_path))[0]}.patch"
     patch_filepath = os.path.join(SCRIBO_INBOX, patch_filename)
-    header = f"--- target: {os.path.abspath(original_file_path)}\n"
-    with open(patch_filepath, 'w') as f:
-        f.write(header + diff_content)
+    # Write under a temporary name and rename into place, so the speculator
+    # never sees a half-written patch. Hunks are streamed straight to disk.
+    temp_filepath = os.path.join(SCRIBO_INBOX, f".{patch_filename}.part")
+    with open(temp_filepath, 'w') as f:
+        written = write_section(f, original_file_path, revised_file_path, fields)
+    if not written:
+        os.remove(temp_filepath)
+        return None
+    os.replace(temp_filepath, patch_filepath)
     return patch_filepath
 
+# --- Tree mode: many file pairs, one bundle ---
+def collect_pairs(original_dir, revised_dir, only=None):
+    """
+    Pairs up files by relative path across two directory trees. Returns
+    (pairs, skipped) where skipped lists relative paths present on one
+    side only; a patch can only mend files that already exist.
+    """
+    def walk(root):
+        found = set()
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames[:] = [d for d in dirnames if d not in IGNORED_DIRS and not d.endswith('.egg-info')]
+            for filename in filenames:
+                if not filename.endswith((BACKUP_SUFFIX, '.pyc')):
+                    found.add(os.path.relpath(os.path.join(dirpath, filename), root))
+        return found
+    original_files, revised_files = walk(original_dir), walk(revised_dir)
+    if only is not None:
+        only = {os.path.normpath(path) for path in only}
+        original_files &= only
+        revised_files &= only
+    pairs = [(os.path.join(original_dir, rel), os.path.join(revised_dir, rel))
+             for rel in sorted(original_files & revised_files)]
+    return pairs, sorted(original_files ^ revised_files)
+
+def write_section_part(job):
+    """Process-pool worker: diffs one pair into its own part file."""
+    original_file_path, revised_file_path, part_path, fields = job
+    try:
+        with open(part_path, 'w') as f:
+            written = write_section(f, original_file_path, revised_file_path, fields)
+        return (part_path if written else None), None
+    except (OSError, UnicodeDecodeError) as e:
+        return None, f"{original_file_path}: {e}"
+
+def generate_bundle(pairs, jobs=None, name="bundle", fields=None):
+    """
+    Diffs every (original, revised) pair in parallel and writes one
+    multi-target patch bundle to the inbox, which the speculator applies
+    and verifies as a single unit. Returns (bundle path or None, errors).
+    """
+    os.makedirs(SCRIBO_INBOX, exist_ok=True)
+    timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    bundle_filename = f"{timestamp}-{name}.patch"
+    parts_dir = tempfile.mkdtemp(prefix=".compara-", dir=SCRIBO_INBOX)
+    try:
+        work = [(original, revised, os.path.join(parts_dir, f"{i}.part"), fields)
+                for i, (original, revised) in enumerate(pairs)]
+        if jobs == 1 or len(work) < 2:
+            results = [write_section_part(job) for job in work]
+        else:
+            with ProcessPoolExecutor(max_workers=jobs) as pool:
+                chunksize = max(1, len(work) // ((jobs or os.cpu_count() or 1) * 4))
+                results = list(pool.map(write_section_part, work, chunksize=chunksize))
+        parts = [part for part, _ in results if part]
+        errors = [error for _, error in results if error]
+        if not parts:
+            return None, errors
+        temp_filepath = os.path.join(SCRIBO_INBOX, f".{bundle_filename}.part")
+        with open(temp_filepath, 'w') as bundle:
+            for part in parts:
+                with open(part, 'r') as f:
+                    shutil.copyfileobj(f, bundle)
+        bundle_filepath = os.path.join(SCRIBO_INBOX, bundle_filename)
+        os.replace(temp_filepath, bundle_filepath)
+        return bundle_filepath, errors
+    finally:
+        shutil.rmtree(parts_dir, ignore_errors=True)
+
 @app.callback(invoke_without_command=True)
 def main(
-    original: str = typer.Argument(..., help="The path to the original source file."),
-    revised: str = typer.Argument(..., help="The path to the file with changes.")
+    original: str = typer.Argument(..., help="The path to the original source file or directory."),
+    revised: str = typer.Argument(..., help="The path to the file or directory with changes."),
+    files: str = typer.Option(None, "--files", help="With directories: a file listing the relative paths to compare, one per line."),
+    jobs: int = typer.Option(None, "--jobs", "-j", min=1, help="With directories: number of parallel diff processes (default: all cores)."),
+    priority: str = typer.Option(None, "--priority", help="Queue priority for the speculator: urgent, high, normal, low, bulk (or pN)."),
+    deadline: str = typer.Option(None, "--deadline", help="Verify by this time: a duration after arrival ('15m') or an ISO date/time.")
 ):
     """
-    Compares an original and revised file and generates a patch.
+    Compares an original and revised file and generates a patch. Given two
+    directory trees, compares every file they share and generates a single
+    bundle that the speculator applies and verifies all-or-nothing.
     """
-    patch_file = generate_patch_file(original, revised)
+    if priority and parse_priority(priority) is None:
+        print(f"Comparator: Unknown priority '{priority}'.")
+        raise typer.Exit(code=1)
+    if deadline:
+        try:
+            parse_deadline(deadline, 0)
+        except ValueError:
+            print(f"Comparator: Cannot read deadline '{deadline}'.")
+            raise typer.Exit(code=1)
+    fields = {name: value for name, value in (("priority", priority), ("deadline", deadline)) if value}
+    if os.path.isdir(original) or os.path.isdir(revised):
+        if not (os.path.isdir(original) and os.path.isdir(revised)):
+            print("Comparator: Both arguments must be directories to compare trees.")
+            raise typer.Exit(code=1)
+        only = None
+        if files:
+            with open(files, 'r') as f:
+                only = [line.strip() for line in f if line.strip() and not line.startswith('#')]
+        pairs, skipped = collect_pairs(original, revised, only)
+        for rel in skipped:
+            print(f"Comparator: Skipping '{rel}' (present in only one tree).")
+        name = os.path.basename(os.path.normpath(original)) or "bundle"
+        patch_file, errors = generate_bundle(pairs, jobs=jobs, name=name, fields=fields)
+        for error in errors:
+            print(f"Comparator: Could not diff {error}")
+        if patch_file:
+            print(f"Comparator: Successfully generated bundle: {patch_file}")
+        else:
+            print("Trees are identical. No patch generated.")
+        return
+    patch_file = generate_patch_file(original, revised, fields)
     if patch_file:
         print(f"Comparator: Successfully generated patch: {patch_file}")
     else:
@@ -1,17 +1,151 @@
 import typer
 import os
 import sys
+import time
 import venv
+import shutil
+import tempfile
+import contextlib
 import subprocess
 
 app = typer.Typer(name="inceptor", help="Creates and initializes a new project initiative.")
 
-def create_initiative(initiative_path, user_name):
+# Template venvs and the wheelhouse they are installed from, shared by every initiative.
+INCEPTOR_CACHE = os.path.expanduser("~/.scriptor/inceptor")
+WHEELHOUSE = os.path.join(INCEPTOR_CACHE, "wheelhouse")
+TOOLCHAIN = ["black", "ruff", "pytest"]
+
+def template_path(toolchain):
+    version = f"py{sys.version_info.major}{sys.version_info.minor}"
+    return os.path.join(INCEPTOR_CACHE, f"venv-{version}{'-toolchain' if toolchain else ''}")
+
+def scripts_dir(venv_path):
+    """The directory venv puts executables in: Scripts on Windows, bin elsewhere."""
+    return os.path.join(venv_path, "Scripts" if sys.platform == "win32" else "bin")
+
+@contextlib.contextmanager
+def cache_lock():
+    """Serializes template builds across inceptor processes."""
+    with open(os.path.join(INCEPTOR_CACHE, ".lock"), "a+") as lock:
+        if sys.platform == "win32":
+            import msvcrt
+            lock.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(lock.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    pass  # LK_LOCK gives up after ten seconds; keep waiting.
+            try:
+                yield
+            finally:
+                lock.seek(0)
+                msvcrt.locking(lock.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            yield
+
+def relocate(venv_path, old_path, new_path):
+    """
+    Rewrites the absolute venv path baked into activation scripts, console
+    script shebangs and pyvenv.cfg. Everything else in a venv is relative.
+    """
+    old, new = old_path.encode(), new_path.encode()
+    candidates = [os.path.join(venv_path, "pyvenv.cfg")]
+    bin_dir = scripts_dir(venv_path)
+    candidates += [os.path.join(bin_dir, name) for name in os.listdir(bin_dir)]
+    for path in candidates:
+        if os.path.islink(path) or not os.path.isfile(path):
+            continue
+        with open(path, "rb") as f:
+            content = f.read()
+        if old not in content:
+            continue
+        mode = os.stat(path).st_mode
+        if os.stat(path).st_nlink > 1:
+            os.remove(path)  # Never write through a hard link into the template.
+        with open(path, "wb") as f:
+            f.write(content.replace(old, new))
+        os.chmod(path, mode)
+
+def clone_venv(template, destination):
+    """
+    Clones a template venv: files are hard-linked (copied across
+    filesystems), symlinks are recreated, and the files that name the venv
+    path are then rewritten for the destination.
+    """
+    for dirpath, dirnames, filenames in os.walk(template):
+        target_dir = os.path.join(destination, os.path.relpath(dirpath, template))
+        os.makedirs(target_dir, exist_ok=True)
+        for name in dirnames + filenames:
+            source, target = os.path.join(dirpath, name), os.path.join(target_dir, name)
+            if os.path.islink(source):
+                os.symlink(os.readlink(source), target)
+                if name in dirnames:
+                    dirnames.remove(name)  # os.walk would not descend into it anyway.
+            elif name in filenames:
+                try:
+                    os.link(source, target)
+                except OSError:
+                    shutil.copy2(source, target)
+    relocate(destination, template, destination)
+
+def fill_wheelhouse(packages, offline):
+    """Ensures wheels for packages (and their dependencies) are in the local wheelhouse."""
+    os.makedirs(WHEELHOUSE, exist_ok=True)
+    command = [sys.executable, "-m", "pip", "wheel", "-q", "-w", WHEELHOUSE, "--find-links", WHEELHOUSE]
+    if offline:
+        command.append("--no-index")
+    result = subprocess.run(command + packages, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Could not fill the wheelhouse{' offline' if offline else ''}: "
+                           f"{result.stderr.strip().splitlines()[-1] if result.stderr.strip() else result.returncode}")
+
+def prepare_template(toolchain=False, offline=False, refresh=False):
+    """
+    Returns the path of the template venv, building it first if needed:
+    a venv with pip and, with toolchain, the scriptor toolchain installed
+    from the wheelhouse without touching the package index. It is built
+    beside its final location and renamed into place, under a lock, so
+    concurrent inceptors never see a half-built template.
+    """
+    template = template_path(toolchain)
+    os.makedirs(INCEPTOR_CACHE, exist_ok=True)
+    with cache_lock():
+        if os.path.isdir(template) and not refresh:
+            return template
+        print(f"Inceptor: Preparing template venv at '{template}' (once)...")
+        building = tempfile.mkdtemp(prefix=".building-", dir=INCEPTOR_CACHE)
+        try:
+            venv.create(building, with_pip=True)
+            if toolchain:
+                fill_wheelhouse(TOOLCHAIN, offline)
+                subprocess.run([os.path.join(scripts_dir(building), "python.exe" if sys.platform == "win32" else "python"), "-m", "pip", "install", "-q",
+                                "--no-index", "--find-links", WHEELHOUSE] + TOOLCHAIN,
+                               check=True, capture_output=True)
+            relocate(building, building, template)
+            if os.path.isdir(template):
+                shutil.rmtree(template)
+            os.rename(building, template)
+        except BaseException:
+            shutil.rmtree(building, ignore_errors=True)
+            raise
+        return template
+
+def create_initiative(initiative_path, user_name, fast=False, toolchain=False, offline=False, refresh=False):
     try:
         venv_path = os.path.join(initiative_path, "venv")
         print(f"Inceptor: Initializing '{os.path.basename(initiative_path)}' for user '{user_name}'...")
-        os.makedirs(venv_path, exist_ok=True)
-        venv.create(venv_path, with_pip=True)
+        start = time.monotonic()
+        if fast or toolchain:
+            if os.path.exists(venv_path):
+                raise FileExistsError(f"'{venv_path}' already exists")
+            clone_venv(prepare_template(toolchain, offline, refresh), os.path.abspath(venv_path))
+        else:
+            os.makedirs(venv_path, exist_ok=True)
+            venv.create(venv_path, with_pip=True)
+        print(f"Inceptor: Virtual environment ready in {time.monotonic() - start:.1f}s.")
         with open(os.path.join(initiative_path, "README.md"), "w") as f:
             f.write(f"# Initiative: {os.path.basename(initiative_path)}\n\nOwner: {user_name}\n")
         subprocess.run(["git", "init"], cwd=initiative_path, capture_output=True)
@@ -24,9 +158,14 @@ def create_initiative(initiative_path, user_name):
 @app.callback(invoke_without_command=True)
 def main(
     path: str = typer.Argument(..., help="The path to create the initiative in."),
-    user: str = typer.Option("scribo_user", help="The owner/user name for the initiative.")
+    user: str = typer.Option("scribo_user", help="The owner/user name for the initiative."),
+    fast: bool = typer.Option(False, "--fast", help="Clone a cached template venv (hard links) instead of bootstrapping pip."),
+    toolchain: bool = typer.Option(False, "--toolchain", help="Pre-install black, ruff and pytest from the local wheelhouse (implies --fast)."),
+    offline: bool = typer.Option(False, "--offline", help="Never contact the package index; the wheelhouse must already hold the toolchain."),
+    refresh: bool = typer.Option(False, "--refresh", help="Rebuild the cached template venv first.")
 ):
     """
     Initializes a new project at the given path.
     """
-    create_initiative(path, user)
+    if not create_initiative(path, user, fast=fast, toolchain=toolchain, offline=offline, refresh=refresh):
+        raise typer.Exit(code=1)
@@ -1,17 +1,43 @@
+import importlib
 import typer
-# Import all our command modules
-from . import speculator, praetor, comparator, inceptor
+from typer.core import TyperGroup
+
+# Command name -> module defining its Typer app. Modules are imported only
+# when their command runs, so 'scriptor compara' never pays for watchdog,
+# paramiko or black.
+COMMANDS = {
+    "speculator": "speculator",
+    "praetor": "praetor",
+    "compara": "comparator",
+    "inceptor": "inceptor",
+    "bench": "certamen",
+    "acta": "acta",
+}
+
+class LazyGroup(TyperGroup):
+    def list_commands(self, ctx):
+        return list(COMMANDS) + [name for name in super().list_commands(ctx) if name not in COMMANDS]
+
+    def get_command(self, ctx, cmd_name):
+        if cmd_name not in COMMANDS:
+            return super().get_command(ctx, cmd_name)
+        module = importlib.import_module(f".{COMMANDS[cmd_name]}", __package__)
+        # Mount it exactly as app.add_typer() would, so e.g. praetor keeps its subcommands.
+        holder = typer.Typer()
+        holder.add_typer(module.app, name=cmd_name)
+        return typer.main.get_command(holder).get_command(ctx, cmd_name)
 
 app = typer.Typer(
     name="scriptor",
-    help="The canonized toolset for the AetherOS ecosystem."
+    help="The canonized toolset for the AetherOS ecosystem.",
+    cls=LazyGroup
 )
 
-# Register all the command modules as sub-applications
-app.add_typer(speculator.app, name="speculator")
-app.add_typer(praetor.app, name="praetor")
-app.add_typer(comparator.app, name="compara")
-app.add_typer(inceptor.app, name="inceptor")
+@app.callback()
+def main():
+    """
+    The canonized toolset for the AetherOS ecosystem.
+    """
 
 if __name__ == "__main__":
     app()
@@ -0,0 +1,177 @@
+"""
+Mensura: the speculator's measurements.
+
+Every unit of work an Operarius takes (one patch, or one coalesced batch)
+becomes a Span: how long it waited in its lane and how long it spent in
+each stage (apply, ornator, probator). Finished spans are written as JSON
+lines next to the rotating log, and folded into process-wide counters and
+histograms that can be scraped in Prometheus text format:
+
+    {"patches": ["20250101-120000-guide.patch"], "worker": "Operarius-1",
+     "queue_wait": 0.002, "stages": {"apply": 0.004, "ornator": 0.08,
+     "probator": 1.9}, "total": 1.99, "outcomes": {"...": "applied"}, "ts": ...}
+"""
+import os
+import json
+import time
+import logging
+import threading
+import socket
+import socketserver
+import logging.handlers
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from .acta import queue_logger
+
+SPANS_NAME = "Acta_Mensurae.jsonl"
+# Upper bounds (seconds) of the latency histogram buckets. Test runs dominate
+# the top end, in-memory patching the bottom.
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+spans_log = logging.getLogger("scriptor.spans")
+spans_log.propagate = False  # Spans go to their own file, never to Acta_Scriptoris.log.
+
+def setup_spans(inbox):
+    if spans_log.handlers:
+        return
+    handler = logging.handlers.RotatingFileHandler(
+        os.path.join(inbox, SPANS_NAME), maxBytes=10485760, backupCount=5
+    )
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    queue_logger(spans_log, [handler])  # Written on a listener thread, not the worker's.
+    spans_log.setLevel(logging.INFO)
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.counts[i] += 1
+        self.total += seconds
+        self.count += 1
+
+class Metrics:
+    """Process-wide outcome counters, stage latency histograms and gauges."""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.outcomes = {}    # outcome -> count
+        self.histograms = {}  # stage -> Histogram
+        self.gauges = {}      # name -> (help, callable returning the current value)
+
+    def count(self, outcome):
+        with self.lock:
+            self.outcomes[outcome] = self.outcomes.get(outcome, 0) + 1
+
+    def observe(self, stage, seconds):
+        with self.lock:
+            self.histograms.setdefault(stage, Histogram()).observe(seconds)
+
+    def gauge(self, name, help_text, read):
+        self.gauges[name] = (help_text, read)
+
+    def render(self):
+        """Returns the metrics in the Prometheus text exposition format."""
+        out = []
+        for name, (help_text, read) in sorted(self.gauges.items()):
+            out += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge", f"{name} {read()}"]
+        with self.lock:
+            out += ["# HELP scriptor_patches_total Patches finished by the speculator, by outcome.",
+                    "# TYPE scriptor_patches_total counter"]
+            for outcome, value in sorted(self.outcomes.items()):
+                out.append(f'scriptor_patches_total{{outcome="{outcome}"}} {value}')
+            out += ["# HELP scriptor_stage_seconds Time spent per patch (or coalesced batch) in each stage.",
+                    "# TYPE scriptor_stage_seconds histogram"]
+            for stage, histogram in sorted(self.histograms.items()):
+                for bound, value in zip(BUCKETS, histogram.counts):
+                    out.append(f'scriptor_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {value}')
+                out.append(f'scriptor_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {histogram.count}')
+                out.append(f'scriptor_stage_seconds_sum{{stage="{stage}"}} {histogram.total:.6f}')
+                out.append(f'scriptor_stage_seconds_count{{stage="{stage}"}} {histogram.count}')
+        return "\n".join(out) + "\n"
+
+METRICS = Metrics()
+
+class Span:
+    """Timings and outcomes for one unit of Operarius work."""
+    def __init__(self, patch_paths, worker, queue_wait=0.0):
+        self.patches = [os.path.basename(p) for p in patch_paths]
+        self.worker = worker
+        self.queue_wait = queue_wait
+        self.started = time.monotonic()
+        self.stages = {}
+        self.outcomes = {}
+        self.lock = threading.Lock()  # Speculative candidates time their stages in parallel.
+        METRICS.observe("queue_wait", queue_wait)
+
+    @contextmanager
+    def stage(self, name):
+        """Times the enclosed block; repeated stages (e.g. during bisection) add up."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self.lock:
+                self.stages[name] = self.stages.get(name, 0.0) + elapsed
+            METRICS.observe(name, elapsed)
+
+    def outcome(self, patch_path, outcome):
+        self.outcomes[os.path.basename(patch_path)] = outcome
+
+    def finish(self):
+        total = time.monotonic() - self.started
+        METRICS.observe("total", total)
+        spans_log.info(json.dumps({
+            "patches": self.patches,
+            "worker": self.worker,
+            "queue_wait": round(self.queue_wait, 6),
+            "stages": {name: round(seconds, 6) for name, seconds in self.stages.items()},
+            "total": round(total, 6),
+            "outcomes": self.outcomes,
+            "ts": time.time(),
+        }))
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] not in ('/', '/metrics'):
+            self.send_error(404)
+            return
+        body = METRICS.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Scrapes would otherwise flood the console every few seconds.
+
+def serve_metrics(address):
+    """
+    Serves /metrics on a background thread and returns the server.
+    address is 'PORT', 'HOST:PORT', or 'unix:/path/to/socket' (where the
+    platform has Unix sockets). Raises ValueError for an unusable address.
+    """
+    if address.startswith("unix:"):
+        if not hasattr(socket, 'AF_UNIX'):
+            raise ValueError("unix: metrics sockets are not supported on this platform")
+        class UnixMetricsServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+            daemon_threads = True
+        path = os.path.expanduser(address[len("unix:"):])
+        if os.path.exists(path):
+            os.remove(path)  # A stale socket from a previous run.
+        server = UnixMetricsServer(path, MetricsHandler)
+        # BaseHTTPRequestHandler expects a (host, port) client address.
+        server.get_request = lambda: (server.socket.accept()[0], ("unix", 0))
+    else:
+        host, _, port = address.rpartition(":")
+        if not port.isdigit():
+            raise ValueError(f"'{address}' is not PORT, HOST:PORT or unix:/path")
+        server = ThreadingHTTPServer((host or "127.0.0.1", int(port)), MetricsHandler)
+    thread = threading.Thread(target=server.serve_forever, name="Mensura", daemon=True)
+    thread.start()
+    return server
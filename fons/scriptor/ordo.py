@@ -0,0 +1,92 @@
+"""
+Ordo: the order in which queued patches are worked.
+
+Each patch carries a priority and an optional deadline, read from header
+fields next to its first '--- target:' line:
+
+    --- target: /abs/path/to/file.py
+    --- priority: urgent
+    --- deadline: 15m
+
+A priority may also be given by the file name, as in 'fix.urgent.patch'
+or 'fix.p0.patch'; the header wins. Lower ranks are worked first: by
+priority, then earliest deadline first, then arrival. Patches made by
+compara also name the sha256 of the file they were diffed against
+('--- base:'), which is what lets a newer patch supersede a queued one.
+"""
+import os
+import re
+import time
+import logging
+from datetime import datetime
+from .perfector import read_headers
+
+PRIORITIES = {'urgent': 0, 'high': 1, 'normal': 2, 'low': 3, 'bulk': 4}
+DEFAULT_PRIORITY = PRIORITIES['normal']
+DURATION = re.compile(r'(\d+(?:\.\d+)?)([smhd])')
+UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+def parse_priority(value):
+    """Accepts a priority name, 'pN' or a plain integer; returns None otherwise."""
+    value = value.strip().lower()
+    if value in PRIORITIES:
+        return PRIORITIES[value]
+    match = re.fullmatch(r'p?(\d+)', value)
+    return int(match.group(1)) if match else None
+
+def parse_deadline(value, queued_at):
+    """Accepts a duration after arrival ('90s', '15m', '2h') or an ISO date/time; returns an epoch."""
+    match = DURATION.fullmatch(value.strip())
+    if match:
+        return queued_at + float(match.group(1)) * UNITS[match.group(2)]
+    return datetime.fromisoformat(value.strip()).timestamp()
+
+class Ticket:
+    """A queued patch with what the Dispatcher needs to order it."""
+    def __init__(self, patch_path, seq, queued_at=None):
+        self.patch_path = patch_path
+        self.seq = seq
+        self.queued_at = queued_at or time.time()
+        headers = read_headers(patch_path)
+        self.targets = {target for target, _ in headers}
+        self.bases = {target: fields['base'] for target, fields in headers if 'base' in fields}
+        fields = {}
+        for _, section_fields in reversed(headers):
+            fields.update(section_fields)  # The first section's fields win.
+        self.priority = self.read_priority(fields.get('priority'))
+        self.deadline = None
+        if fields.get('deadline'):
+            try:
+                self.deadline = parse_deadline(fields['deadline'], self.queued_at)
+            except ValueError:
+                logging.warning(f"Ordo: Ignoring unreadable deadline '{fields['deadline']}' "
+                                f"in '{os.path.basename(patch_path)}'.")
+
+    def read_priority(self, value):
+        if value is not None:
+            priority = parse_priority(value)
+            if priority is not None:
+                return priority
+            logging.warning(f"Ordo: Ignoring unknown priority '{value}' in '{os.path.basename(self.patch_path)}'.")
+        stem = os.path.basename(self.patch_path)[:-len('.patch')]
+        if '.' in stem:
+            priority = parse_priority(stem.rsplit('.', 1)[1])
+            if priority is not None:
+                return priority
+        return DEFAULT_PRIORITY
+
+    def rank(self):
+        return (self.priority, self.deadline if self.deadline is not None else float('inf'), self.seq)
+
+    def depends_on(self, other):
+        """A patch never overtakes a queued patch for the same file: its hunks may build on it."""
+        return bool(self.targets & other.targets)
+
+    def supersedes(self, other):
+        """
+        True when this (newer) patch rewrites every file the other does,
+        diffed from the same base: the other's result would be overwritten
+        anyway, so verifying it is wasted work.
+        """
+        return (self.patch_path != other.patch_path and bool(other.targets)
+                and all(other.bases.get(t) is not None and self.bases.get(t) == other.bases[t] for t in other.targets))
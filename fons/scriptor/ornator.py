@@ -0,0 +1,139 @@
+import os
+import sys
+import hashlib
+import logging
+import threading
+import subprocess
+from collections import OrderedDict
+from .probator_tool import project_info
+from .perfector import write_atomically
+
+try:
+    import black
+except ImportError:  # Fall back to the black executable.
+    black = None
+
+# Hashes of (directory, config stamp, content) the Ornator has already
+# produced or found clean. The directory decides which black/ruff
+# configuration applies and the stamp changes whenever that configuration
+# is edited. A matching file needs neither tool.
+CACHE_SIZE = 4096
+_formatted = OrderedDict()
+_lock = threading.Lock()
+
+def is_known_clean(digest):
+    with _lock:
+        if digest in _formatted:
+            _formatted.move_to_end(digest)
+            return True
+        return False
+
+def remember_clean(digest):
+    with _lock:
+        _formatted[digest] = True
+        _formatted.move_to_end(digest)
+        while len(_formatted) > CACHE_SIZE:
+            _formatted.popitem(last=False)
+
+def forget_clean():
+    """Empties the cache, so the next orna() of any file formats it for real."""
+    with _lock:
+        _formatted.clear()
+
+_modes = {}  # (pyproject path, mtime_ns) -> black.Mode
+
+def black_mode(target_file):
+    """Builds a black.Mode from the project's pyproject.toml, like the black CLI would."""
+    info = project_info(os.path.dirname(target_file))
+    pyproject = info.pyproject if info else None
+    key = None
+    if pyproject:
+        try:
+            key = (pyproject, os.stat(pyproject).st_mtime_ns)
+        except OSError:
+            pyproject = None
+    if key in _modes:
+        return _modes[key]
+    config = {}
+    if pyproject:
+        try:
+            config = black.parse_pyproject_toml(pyproject)
+        except Exception as e:
+            logging.warning(f"Ornator: Could not read black config from '{pyproject}': {e}")
+    target_versions = set()
+    for version in config.get('target_version', []):
+        try:
+            target_versions.add(black.TargetVersion[version.upper()])
+        except KeyError:
+            pass
+    mode = black.Mode(
+        target_versions=target_versions,
+        line_length=config.get('line_length', black.DEFAULT_LINE_LENGTH),
+        string_normalization=not config.get('skip_string_normalization', False),
+        magic_trailing_comma=not config.get('skip_magic_trailing_comma', False),
+        preview=config.get('preview', False),
+    )
+    if key:
+        _modes[key] = mode
+    return mode
+
+def run_black(source, target_file):
+    if black is not None:
+        try:
+            return black.format_file_contents(source, fast=False, mode=black_mode(target_file))
+        except black.NothingChanged:
+            return source
+    black_path = os.path.join(os.path.dirname(sys.executable), "black")
+    result = subprocess.run([black_path, "-q", "--stdin-filename", target_file, "-"],
+                            input=source, check=True, capture_output=True, text=True)
+    return result.stdout
+
+def run_ruff(source, target_file):
+    ruff_path = os.path.join(os.path.dirname(sys.executable), "ruff")
+    result = subprocess.run([ruff_path, "check", "--fix", "--stdin-filename", target_file, "-"],
+                            input=source, capture_output=True, text=True)
+    # 1 means "fixed what it could, violations remain": the fixed source is still on stdout.
+    if result.returncode not in (0, 1):
+        raise RuntimeError(result.stderr.strip() or f"ruff exited with {result.returncode}")
+    if source.strip() and not result.stdout:
+        raise RuntimeError("ruff returned no source")
+    return result.stdout
+
+def config_stamp(directory):
+    """The project's formatter configs and their mtimes, so editing one makes every key miss."""
+    info = project_info(directory)
+    stamp = []
+    for path in info.formatter_configs if info else ():
+        try:
+            stamp.append(f"{path}:{os.stat(path).st_mtime_ns}")
+        except OSError:
+            stamp.append(f"{path}:-")
+    return "\0".join(stamp)
+
+def content_key(target_file, source):
+    directory = os.path.dirname(os.path.abspath(target_file))
+    return hashlib.sha256(f"{directory}\0{config_stamp(directory)}\0{source}".encode('utf-8')).hexdigest()
+
+def orna(target_file):
+    """
+    Ornator: Formats a Python file with black (in-process) and a single
+    'ruff check --fix' pass over stdin, writing the file at most once.
+    Files whose content is already known to be clean are skipped.
+    """
+    if not target_file.endswith('.py'):
+        logging.info(f"Ornator: Skipping non-Python file.")
+        return
+    with open(target_file, 'r', newline='') as f:
+        source = f.read()
+    if is_known_clean(content_key(target_file, source)):
+        logging.info(f"Ornator: '{os.path.basename(target_file)}' is already formatted. Skipping.")
+        return
+    logging.info(f"Ornator: Formatting '{os.path.basename(target_file)}'...")
+    try:
+        formatted = run_ruff(run_black(source, target_file), target_file)
+        if formatted != source:
+            write_atomically(target_file, formatted)
+        remember_clean(content_key(target_file, formatted))
+        logging.info("Ornator: Formatting complete.")
+    except Exception as e:
+        logging.warning(f"Ornator: Formatting failed. Details: {e}")
@@ -1,32 +1,281 @@
 import os
-import patch
+import re
+import shutil
+import tempfile
 from .probator_tool import find_project_root # We can reuse this function
 
-def perfice_resarcio(patch_path):
-    with open(patch_path, 'r') as f:
-        patch_content = f.read()
+HUNK_HEADER = re.compile(r'^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@')
+HEADER_FIELD = re.compile(r'^--- ([a-z_]+): (.*)$')
+NO_NEWLINE = '\\ No newline at end of file'
+BACKUP_SUFFIX = ".scribo_bak"
+# How far (in lines) a hunk may drift from its stated position, and how many
+# context lines may be ignored at each end of a hunk, before it is rejected.
+MAX_OFFSET = 1000
+MAX_FUZZ = 2
 
-    first_line = patch_content.split('\n', 1)[0]
-    if not first_line.startswith('--- target: '):
+class PatchError(Exception):
+    """A patch could not be parsed or applied; the message says exactly where."""
+
+class Hunk:
+    def __init__(self, number, old_start, new_start):
+        self.number = number
+        self.old_start = old_start
+        self.new_start = new_start
+        self.lines = []  # (op, text) with op in ' ', '-', '+'
+
+    @property
+    def old(self):
+        return [text for op, text in self.lines if op != '+']
+
+class Section:
+    """One '--- target:' section: a target file, its header fields and its hunks."""
+    def __init__(self, target):
+        self.target = target
+        self.fields = {}
+        self.hunks = []
+
+def read_target(patch_path):
+    """Returns the target file named in a patch header, or None."""
+    try:
+        with open(patch_path, 'r') as f:
+            header = f.readline()
+    except OSError:
         return None
-    target_file = first_line.split('--- target: ')[1].strip()
-    if not os.path.exists(target_file):
+    if not header.startswith('--- target: '):
         return None
+    return header.split('--- target: ')[1].strip()
+
+def read_targets(patch_path):
+    """
+    Returns every target file named in a patch, in order. A single-file
+    patch names one; a bundle from 'compara' over directory trees names one
+    per section. Returns [] if the patch does not start with a header.
+    """
+    targets = []
+    try:
+        with open(patch_path, 'r') as f:
+            for number, line in enumerate(f):
+                if line.startswith('--- target: '):
+                    targets.append(line.split('--- target: ')[1].strip())
+                elif number == 0:
+                    return []
+    except OSError:
+        return []
+    return targets
+
+def read_headers(patch_path):
+    """
+    Returns (target, header fields) for every section of a patch, in
+    order, without parsing its hunks. Returns [] if it has no header.
+    """
+    sections = []
+    in_header = False
+    try:
+        with open(patch_path, 'r') as f:
+            for number, line in enumerate(f):
+                if line.startswith('--- target: '):
+                    sections.append((line.split('--- target: ')[1].strip(), {}))
+                    in_header = True
+                    continue
+                if number == 0:
+                    return []
+                field = HEADER_FIELD.match(line.rstrip('\r\n')) if in_header else None
+                if field:
+                    sections[-1][1][field.group(1)] = field.group(2).strip()
+                else:
+                    in_header = False
+    except (OSError, UnicodeDecodeError):
+        return []
+    return sections
+
+def parse_patch(patch_content):
+    """
+    Parses a Scriptor patch (one or more '--- target:' sections, each an
+    optional run of '--- key: value' header fields followed by a unified
+    diff) in a single pass. Raises PatchError on malformed input.
+    """
+    sections, hunk, remaining = [], None, (0, 0)
+    in_header = False
+    for number, line in enumerate(patch_content.splitlines(keepends=True), 1):
+        if hunk is not None and remaining != (0, 0):
+            op = line[:1]
+            if line.rstrip('\r\n') == '':
+                op, line = ' ', ' ' + line  # Context line whose lone space was stripped.
+            if op == '\\':
+                if not hunk.lines:
+                    raise PatchError(f"line {number}: '{NO_NEWLINE}' outside a hunk")
+                last_op, text = hunk.lines[-1]
+                hunk.lines[-1] = (last_op, text.rstrip('\r\n'))
+                continue
+            if op not in ' -+':
+                raise PatchError(f"line {number}: hunk #{hunk.number} ends early")
+            old_left, new_left = remaining
+            old_left -= op != '+'
+            new_left -= op != '-'
+            if old_left < 0 or new_left < 0:
+                raise PatchError(f"line {number}: hunk #{hunk.number} is longer than its header says")
+            hunk.lines.append((op, line[1:]))
+            remaining = (old_left, new_left)
+            continue
+        if line.startswith('\\') and hunk is not None and hunk.lines:
+            last_op, text = hunk.lines[-1]
+            hunk.lines[-1] = (last_op, text.rstrip('\r\n'))
+            continue
+        if line.startswith('--- target: '):
+            sections.append(Section(line.split('--- target: ')[1].strip()))
+            hunk, in_header = None, True
+            continue
+        if not sections:
+            raise PatchError("patch does not start with a '--- target:' header")
+        field = HEADER_FIELD.match(line.rstrip('\r\n')) if in_header else None
+        if field:
+            sections[-1].fields[field.group(1)] = field.group(2).strip()
+            continue
+        in_header = False
+        match = HUNK_HEADER.match(line)
+        if match:
+            old_start, old_len, new_start, new_len = match.groups()
+            hunk = Hunk(len(sections[-1].hunks) + 1, int(old_start), int(new_start))
+            sections[-1].hunks.append(hunk)
+            remaining = (1 if old_len is None else int(old_len), 1 if new_len is None else int(new_len))
+            continue
+        if line.startswith(('--- ', '+++ ')) or not line.strip():
+            continue  # Diff file headers and blank separators.
+        raise PatchError(f"line {number}: unexpected content outside a hunk")
+    if hunk is not None and remaining != (0, 0):
+        raise PatchError(f"hunk #{hunk.number} is truncated")
+    return sections
+
+def _normal(line):
+    return line.rstrip('\r\n')
 
-    # --- NEW ROOT-FINDING LOGIC ---
-    # We find the project root and tell the patch tool to work from there.
-    project_root = find_project_root(os.path.dirname(target_file))
-    if not project_root:
-        # Fallback if we're not in a proper project
-        project_root = os.path.dirname(target_file)
-    # ----------------------------
-
-    print(f"Perfector: Mending '{os.path.basename(target_file)}' (root: {project_root})")
-    patch_set = patch.fromstring(patch_content.encode('utf-8'))
-    
-    # We no longer need 'strip'. We just provide the correct root.
-    if patch_set.apply(root=project_root):
-        return target_file
-    else:
-        print(f"  -> Error: Could not apply patch.")
+def _matches(lines, at, expected):
+    if at < 0 or at + len(expected) > len(lines):
+        return False
+    return all(_normal(lines[at + k]) == _normal(text) for k, text in enumerate(expected))
+
+def apply_hunks(lines, hunks, target_name="file"):
+    """
+    Applies hunks to a list of lines in memory and returns (new lines,
+    report). Each hunk is searched for at its stated position (shifted by
+    the drift of the previous hunk) first, then at growing offsets, then
+    with up to MAX_FUZZ context lines ignored at each end. Line endings are
+    compared loosely and added lines take the file's own line ending.
+    Raises PatchError naming the failing hunk.
+    """
+    eol = '\r\n' if lines and lines[0].endswith('\r\n') else '\n'
+    result, report = [], []
+    cursor, drift = 0, 0  # Next unconsumed input line; offset of the previous hunk.
+    for hunk in hunks:
+        stated = (hunk.old_start - 1 if hunk.old else hunk.old_start) + drift
+        found = None
+        for fuzz in range(MAX_FUZZ + 1):
+            # Fuzz trims context lines only, never removed or added ones.
+            lead = 0
+            while lead < fuzz and lead < len(hunk.lines) and hunk.lines[lead][0] == ' ':
+                lead += 1
+            trail = 0
+            while trail < fuzz and trail < len(hunk.lines) - lead and hunk.lines[-1 - trail][0] == ' ':
+                trail += 1
+            if fuzz and not (lead or trail):
+                break
+            trimmed = hunk.lines[lead:len(hunk.lines) - trail]
+            expected = [text for op, text in trimmed if op != '+']
+            for distance in range(MAX_OFFSET + 1):
+                candidates = (stated + lead,) if not distance else (stated + lead + distance, stated + lead - distance)
+                for at in candidates:
+                    if at >= cursor and _matches(lines, at, expected):
+                        found = (at, at - lead - stated + drift, fuzz, trimmed)
+                        break
+                if found:
+                    break
+            if found:
+                break
+        if not found:
+            raise PatchError(f"hunk #{hunk.number} FAILED at line {hunk.old_start} of '{target_name}'")
+        at, drift, fuzz, trimmed = found
+        if drift or fuzz:
+            report.append(f"hunk #{hunk.number} applied at line {at + 1} (offset {drift:+d} lines, fuzz {fuzz})")
+        result.extend(lines[cursor:at])
+        for op, text in trimmed:
+            if op == ' ':
+                result.append(lines[at])
+                at += 1
+            elif op == '-':
+                at += 1
+            else:
+                result.append(_normal(text) + eol if text.endswith(('\n', '\r')) else text)
+        cursor = at
+    result.extend(lines[cursor:])
+    return result, report
+
+def write_atomically(target_file, content, backup=None):
+    """
+    Writes content to target_file via a temp file in the same directory and
+    a rename. If backup is given and does not exist yet, it is first made a
+    hard link to the current file, so the old inode becomes the backup for
+    free (falling back to a copy where hard links are unavailable). A
+    symlinked target is written through: its real file is replaced.
+    """
+    target_file = os.path.realpath(target_file)
+    directory = os.path.dirname(os.path.abspath(target_file))
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".perfector-")
+    try:
+        with os.fdopen(fd, 'w', newline='') as f:
+            f.write(content)
+        shutil.copymode(target_file, temp_path)
+        if backup and not os.path.exists(backup):
+            try:
+                os.link(target_file, backup)
+            except OSError:
+                shutil.copy2(target_file, backup)
+        os.replace(temp_path, target_file)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+def perfice_resarcio(patch_path, backup_suffix=None, redirect=None):
+    """
+    Perfector: Applies every section of a patch to its target file.
+    All sections are parsed and applied in memory first; files are only
+    written (atomically) once every hunk of every section has applied, so a
+    failure leaves all targets untouched. With backup_suffix, each target's
+    pre-patch inode is kept as target + backup_suffix unless that backup
+    already exists. redirect, if given, maps each target named in the
+    patch to the file actually patched (e.g. its copy in a scratch tree).
+    Returns the list of patched files, or None.
+    """
+    try:
+        with open(patch_path, 'r', newline='') as f:
+            patch_content = f.read()
+        sections = parse_patch(patch_content)
+    except (OSError, PatchError) as e:
+        print(f"  -> Error: Could not parse patch. {e}")
+        return None
+    if not sections:
         return None
+
+    buffers = {}  # target -> lines, in first-seen order
+    try:
+        for section in sections:
+            target_file = redirect(section.target) if redirect else section.target
+            if target_file not in buffers:
+                if not os.path.exists(target_file):
+                    raise PatchError(f"target file '{target_file}' does not exist")
+                with open(target_file, 'r', newline='') as f:
+                    buffers[target_file] = f.readlines()
+            project_root = find_project_root(os.path.dirname(target_file)) or os.path.dirname(target_file)
+            print(f"Perfector: Mending '{os.path.basename(target_file)}' (root: {project_root})")
+            buffers[target_file], report = apply_hunks(
+                buffers[target_file], section.hunks, os.path.basename(target_file))
+            for note in report:
+                print(f"  -> {note}")
+    except (OSError, UnicodeDecodeError, PatchError) as e:
+        print(f"  -> Error: Could not apply patch. {e}")
+        return None
+
+    for target_file, lines in buffers.items():
+        write_atomically(target_file, ''.join(lines),
+                         backup=target_file + backup_suffix if backup_suffix else None)
+    return list(buffers)
@@ -0,0 +1,146 @@
+"""
+Praegustator: the taster who tries each dish before it reaches the table.
+
+In speculative mode (`speculator --scratch N`) a patch is never applied to
+the live project while it is being verified. Each candidate is applied,
+formatted and tested in a scratch copy of its project, and only a verified
+result is copied back. A scratch copy is a persistent mirror of the project
+kept up to date by a directory walk. Where the filesystem can clone files
+copy-on-write (btrfs, XFS), every file is a clone. Elsewhere only Python
+sources are hard links and every other file, which is what tests write
+to (fixtures, SQLite files, caches), is a real copy. Files the pipeline
+changes (the Perfector and Ornator both write via temp file plus rename)
+get a new inode in the mirror and never touch the originals. What the
+mirror cannot protect against: a test that rewrites a hard-linked source
+file in place, or runs git, which goes through the shared .git.
+"""
+import os
+import shutil
+import hashlib
+import threading
+from .probator_tool import IGNORED_DIRS
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# Ignored directories that scratch trees still need: root markers and
+# virtualenvs. They are linked in as symlinks to the real ones.
+SHARED_DIRS = {'.git', '.hg', '.venv', 'venv', 'node_modules'}
+# Files hard-linked when they cannot be cloned; everything else is copied.
+LINKED_SUFFIXES = ('.py', '.pyi', '.pyx', '.pxd')
+FICLONE = 0x40049409  # linux/fs.h: _IOW(0x94, 9, int)
+
+class ScratchTree:
+    """One hard-linked mirror ("slot") of a project root."""
+    def __init__(self, root, scratch_dir, index):
+        self.root = root
+        digest = hashlib.sha1(root.encode('utf-8')).hexdigest()[:8]
+        self.path = os.path.join(scratch_dir, f"{os.path.basename(root) or 'root'}-{digest}", f"slot-{index}")
+        self.clones = fcntl is not None  # Until the first clone fails.
+
+    def map(self, path):
+        """Returns where a file under the real root lives in this tree."""
+        return os.path.join(self.path, os.path.relpath(path, self.root))
+
+    def contains(self, path):
+        relative = os.path.relpath(path, self.root)
+        return relative != '.' and not relative.startswith('..')
+
+    def sync(self):
+        """
+        Makes the tree mirror the real root again: entries whose inode (or,
+        where hard links are impossible, size and mtime) differ are
+        relinked, and entries the root no longer has are removed. Caches
+        the tests create in the tree (__pycache__, .pytest_cache) are kept.
+        """
+        os.makedirs(self.path, exist_ok=True)
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            mirror = self.map(dirpath) if dirpath != self.root else self.path
+            os.makedirs(mirror, exist_ok=True)
+            wanted = set()
+            for name in list(dirnames):
+                source = os.path.join(dirpath, name)
+                if name in IGNORED_DIRS or name.endswith('.egg-info') or os.path.islink(source):
+                    dirnames.remove(name)
+                    if name in SHARED_DIRS or os.path.islink(source):
+                        self.link_symlink(os.path.abspath(source) if name in SHARED_DIRS else os.readlink(source),
+                                          os.path.join(mirror, name))
+                        wanted.add(name)
+                    continue
+                wanted.add(name)
+            for name in filenames:
+                source, target = os.path.join(dirpath, name), os.path.join(mirror, name)
+                wanted.add(name)
+                if os.path.islink(source):
+                    self.link_symlink(os.readlink(source), target)
+                else:
+                    self.link_file(source, target)
+            for name in os.listdir(mirror):
+                if name in wanted or name in IGNORED_DIRS:
+                    continue
+                stale = os.path.join(mirror, name)
+                if os.path.isdir(stale) and not os.path.islink(stale):
+                    shutil.rmtree(stale, ignore_errors=True)
+                else:
+                    os.remove(stale)
+
+    @staticmethod
+    def link_symlink(destination, target):
+        if os.path.islink(target) and os.readlink(target) == destination:
+            return
+        if os.path.isdir(target) and not os.path.islink(target):
+            shutil.rmtree(target)
+        elif os.path.lexists(target):
+            os.remove(target)
+        os.symlink(destination, target)
+
+    def link_file(self, source, target):
+        try:
+            st = os.stat(source)
+            current = os.lstat(target)
+        except FileNotFoundError:
+            current = None
+        if current is not None:
+            if (current.st_dev, current.st_ino) == (st.st_dev, st.st_ino):
+                return
+            if current.st_nlink == 1 and (current.st_size, current.st_mtime_ns) == (st.st_size, st.st_mtime_ns):
+                return  # An earlier copy or clone.
+            if os.path.isdir(target) and not os.path.islink(target):
+                shutil.rmtree(target)
+            else:
+                os.remove(target)
+        if self.clones and self.clone(source, target):
+            return
+        if source.endswith(LINKED_SUFFIXES):
+            try:
+                os.link(source, target)
+                return
+            except OSError:
+                pass
+        shutil.copy2(source, target)
+
+    def clone(self, source, target):
+        """Makes target a copy-on-write clone of source; False if the filesystem cannot."""
+        try:
+            with open(source, 'rb') as src, open(target, 'wb') as dst:
+                fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+        except OSError:
+            if os.path.lexists(target):
+                os.remove(target)
+            self.clones = False
+            return False
+        shutil.copystat(source, target)
+        return True
+
+_trees = {}
+_trees_lock = threading.Lock()
+
+def scratch_trees(root, scratch_dir, count):
+    """Returns the first `count` scratch trees of a project, reusing them across patches."""
+    with _trees_lock:
+        trees = _trees.setdefault(root, [])
+        while len(trees) < count:
+            trees.append(ScratchTree(root, scratch_dir, len(trees)))
+        return trees[:count]
@@ -1,11 +1,38 @@
 import typer
 import paramiko
 import os
+import json
+import time
+import shlex
+import sqlite3
+import hashlib
 import logging
 import importlib.resources
+from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor
 
 app = typer.Typer(name="praetor", help="The Fleet Commander for the Scriptor ecosystem.")
 
+SENSOR_SCRIPTS = ["get_sm_score.py", "detect_gpu.sh", "log_sm_score.sh"]
+AGENT_UNIT = "sm_sensor.service"
+# Local archive of every host's SM score samples, filled by 'praetor scores'.
+FLEET_SCORES = os.path.expanduser("~/.scriptor/fleet_scores.db")
+# Runs on the host: prints its samples newer than argv[2] from the sensor's store, one JSON row per line.
+# Samples after the archive's newest one, and rollup buckets from its newest
+# one on (that bucket may have been partial when it was pulled).
+REMOTE_SCORE_QUERY = (
+    "import json, sqlite3, sys\n"
+    "db = sqlite3.connect('file:' + sys.argv[1] + '?mode=ro', uri=True)\n"
+    "queries = {'raw': 'SELECT ts, score, cpu, mem, iowait, swap, net_bytes, inference, penalties"
+    " FROM samples WHERE ts > ? ORDER BY ts',\n"
+    "           '1m': 'SELECT bucket, count, score_sum, score_min, score_max FROM rollup_1m WHERE bucket >= ? ORDER BY bucket',\n"
+    "           '1h': 'SELECT bucket, count, score_sum, score_min, score_max FROM rollup_1h WHERE bucket >= ? ORDER BY bucket'}\n"
+    "for table, since in zip(queries, sys.argv[2:]):\n"
+    "    for row in db.execute(queries[table], (float(since),)):\n"
+    "        print(json.dumps([table] + list(row)))\n"
+)
+RESOLUTIONS = ('raw', '1m', '1h')
+
 def get_template(filename):
     """Loads a template file from within the installed package."""
     try:
@@ -15,72 +42,354 @@ def get_template(filename):
         logging.error(f"Template file '{filename}' not found in package.")
         return None
 
+def setup_logging():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - [%(threadName)s] %(message)s')
+
+def parse_target(target):
+    try:
+        user, host = target.split('@')
+    except ValueError:
+        raise ValueError(f"Invalid target '{target}'. Must be 'user@hostname'.")
+    return user, host
+
+def read_inventory(path):
+    """
+    Reads an inventory file: one 'user@hostname' per line, optionally
+    followed by the path to that host's private key. Blank lines and
+    '#' comments are ignored. Returns [(target, key_filename or None)].
+    """
+    hosts = []
+    with open(path, 'r') as f:
+        for number, line in enumerate(f, 1):
+            fields = line.split('#', 1)[0].split()
+            if not fields:
+                continue
+            if len(fields) > 2:
+                raise ValueError(f"{path}:{number}: expected 'user@hostname [key]'.")
+            parse_target(fields[0])
+            hosts.append((fields[0], os.path.expanduser(fields[1]) if len(fields) > 1 else None))
+    return hosts
+
+class SensorDeployment:
+    """
+    Deploys the sensor to one host over a single SSH connection, which is
+    reused for every step: directory setup, remote hashing, the uploads
+    that are actually needed, and the cron install. Safe to re-run.
+    """
+    def __init__(self, target, key_filename=None):
+        self.target = target
+        self.user, self.host = parse_target(target)
+        self.key_filename = key_filename
+        self.remote_dir = f"/home/{self.user}/system_maneuverability"
+        self.ssh = None
+        self.sftp = None
+
+    def log(self, level, message):
+        logging.log(level, f"Praetor [{self.host}]: {message}")
+
+    def run(self, command):
+        """Runs a remote command on the open connection. Returns (exit status, stdout, stderr)."""
+        stdin, stdout, stderr = self.ssh.exec_command(command)
+        out = stdout.read().decode()
+        err = stderr.read().decode()
+        return stdout.channel.recv_exit_status(), out, err
+
+    def connect(self):
+        self.log(logging.INFO, f"Connecting as {self.user}...")
+        self.ssh = paramiko.SSHClient()
+        self.ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        self.ssh.connect(hostname=self.host, username=self.user, key_filename=self.key_filename)
+        self.sftp = self.ssh.open_sftp()
+
+    def close(self):
+        if self.sftp:
+            self.sftp.close()
+        if self.ssh:
+            self.ssh.close()
+
+    def ensure_remote_dir(self):
+        try:
+            self.sftp.stat(self.remote_dir)
+        except IOError:
+            self.log(logging.INFO, f"Creating remote directory: {self.remote_dir}")
+            self.sftp.mkdir(self.remote_dir)
+
+    def remote_hashes(self, names):
+        """Returns {name: sha256} for the scripts already on the host, in one round trip."""
+        paths = " ".join(shlex.quote(f"{self.remote_dir}/{name}") for name in names)
+        _, out, _ = self.run(f"sha256sum {paths} 2>/dev/null")
+        hashes = {}
+        for line in out.splitlines():
+            digest, _, path = line.partition("  ")
+            hashes[os.path.basename(path.strip())] = digest
+        return hashes
+
+    def upload_scripts(self, scripts):
+        """Uploads the templated scripts whose remote hash differs. Returns (uploaded, unchanged)."""
+        payloads = {}
+        for script_name in scripts:
+            content = get_template(script_name)
+            if not content: continue
+            # Replace the hardcoded home directory with the target user's home
+            payloads[script_name] = content.replace("/home/isidore", f"/home/{self.user}").encode()
+        remote = self.remote_hashes(payloads)
+        uploaded, unchanged = [], []
+        for script_name, payload in payloads.items():
+            if remote.get(script_name) == hashlib.sha256(payload).hexdigest():
+                unchanged.append(script_name)
+                continue
+            self.log(logging.INFO, f"Deploying '{script_name}'...")
+            remote_path = f"{self.remote_dir}/{script_name}"
+            # Upload beside the live script and rename over it, so cron never runs a partial file.
+            self.sftp.putfo(BytesIO(payload), remote_path + ".part")
+            self.sftp.chmod(remote_path + ".part", 0o644 if script_name == AGENT_UNIT else 0o755)
+            self.sftp.posix_rename(remote_path + ".part", remote_path)
+            uploaded.append(script_name)
+        return uploaded, unchanged
+
+    def install_cron(self, enabled=True):
+        """
+        Installs the log_sm_score.sh cron job exactly once: any existing
+        lines for the script (including duplicates left by older deploys)
+        are replaced by a single entry, or removed if not enabled.
+        Returns True if the crontab changed.
+        """
+        script = f"{self.remote_dir}/log_sm_score.sh"
+        cron_command = f"* * * * * {script}"
+        _, current, _ = self.run("crontab -l 2>/dev/null")
+        lines = current.splitlines()
+        wanted = [line for line in lines if script not in line] + ([cron_command] if enabled else [])
+        if lines == wanted:
+            return False
+        status, _, err = self.run(f"printf '%s\\n' {' '.join(shlex.quote(line) for line in wanted)} | crontab -")
+        if status != 0:
+            raise RuntimeError(f"Failed to set up cron job. STDERR: {err.strip()}")
+        return True
+
+    def set_agent(self, enabled, restart=False):
+        """
+        Enables (and starts, or restarts after an upgrade) the resident sensor
+        agent as a systemd user service, or stops and disables it.
+        """
+        unit_dir = "~/.config/systemd/user"
+        if enabled:
+            action = "restart" if restart else "start"
+            command = (f"mkdir -p {unit_dir} && install -m 644 {shlex.quote(f'{self.remote_dir}/{AGENT_UNIT}')} {unit_dir}/{AGENT_UNIT}"
+                       f" && systemctl --user daemon-reload && systemctl --user enable {AGENT_UNIT}"
+                       f" && systemctl --user {action} {AGENT_UNIT}")
+        else:
+            command = (f"if [ -e {unit_dir}/{AGENT_UNIT} ]; then systemctl --user disable --now {AGENT_UNIT};"
+                       f" rm -f {unit_dir}/{AGENT_UNIT}; systemctl --user daemon-reload; fi")
+        status, _, err = self.run(command)
+        if status != 0:
+            raise RuntimeError(f"Failed to {'enable' if enabled else 'disable'} the sensor agent. STDERR: {err.strip()}")
+
+    def deploy(self, scripts=SENSOR_SCRIPTS, agent=False):
+        """
+        Runs the whole deployment. With agent=True the sensor runs as a
+        resident systemd user service instead of a per-minute cron job.
+        Returns a summary dict; raises on failure.
+        """
+        self.connect()
+        try:
+            self.ensure_remote_dir()
+            uploaded, unchanged = self.upload_scripts(list(scripts) + ([AGENT_UNIT] if agent else []))
+            # Switch modes in an order that never leaves two sensors writing the same files.
+            if agent:
+                cron_changed = self.install_cron(enabled=False)
+                self.set_agent(True, restart=bool(uploaded))
+            else:
+                self.set_agent(False)
+                cron_changed = self.install_cron()
+            mode = "agent running" if agent else f"cron {'installed' if cron_changed else 'already in place'}"
+            self.log(logging.INFO, f"Deployed. {len(uploaded)} uploaded, {len(unchanged)} unchanged, {mode}. Mutatis mutandis.")
+            return {"uploaded": uploaded, "unchanged": unchanged, "cron_changed": cron_changed, "agent": agent}
+        finally:
+            self.close()
+
+    def fetch_scores(self, since):
+        """
+        Returns {resolution: rows, oldest first} of the host's raw samples
+        and 1m/1h rollups, given the newest time already archived for each.
+        """
+        self.connect()
+        try:
+            db_path = f"{self.remote_dir}/sm_scores.db"
+            bounds = " ".join(repr(since[resolution]) for resolution in RESOLUTIONS)
+            status, out, err = self.run(f"python3 -c {shlex.quote(REMOTE_SCORE_QUERY)} {shlex.quote(db_path)} {bounds}")
+            if status != 0:
+                raise RuntimeError(err.strip().splitlines()[-1] if err.strip() else f"exit status {status}")
+            rows = {resolution: [] for resolution in RESOLUTIONS}
+            for line in out.splitlines():
+                if line.strip():
+                    resolution, *row = json.loads(line)
+                    rows[resolution].append(row)
+            return rows
+        finally:
+            self.close()
+
+class FleetScores:
+    """
+    The local archive of pulled samples, one row per (host, timestamp), and
+    of the hosts' 1m/1h rollups, which outlive the hosts' raw samples.
+    """
+    def __init__(self, path=FLEET_SCORES):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.db = sqlite3.connect(path)
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS samples (
+                host TEXT, ts REAL, score INTEGER, cpu REAL, mem REAL, iowait REAL, swap REAL,
+                net_bytes INTEGER, inference INTEGER, penalties TEXT, PRIMARY KEY (host, ts));
+            CREATE TABLE IF NOT EXISTS rollup_1m (
+                host TEXT, bucket INTEGER, count INTEGER, score_sum INTEGER, score_min INTEGER, score_max INTEGER,
+                PRIMARY KEY (host, bucket));
+            CREATE TABLE IF NOT EXISTS rollup_1h (
+                host TEXT, bucket INTEGER, count INTEGER, score_sum INTEGER, score_min INTEGER, score_max INTEGER,
+                PRIMARY KEY (host, bucket));
+        """)
+
+    def latest(self, host):
+        """The newest archived sample time and rollup buckets of a host, 0 where there are none."""
+        return {
+            'raw': self.db.execute("SELECT max(ts) FROM samples WHERE host = ?", (host,)).fetchone()[0] or 0,
+            '1m': self.db.execute("SELECT max(bucket) FROM rollup_1m WHERE host = ?", (host,)).fetchone()[0] or 0,
+            '1h': self.db.execute("SELECT max(bucket) FROM rollup_1h WHERE host = ?", (host,)).fetchone()[0] or 0,
+        }
+
+    def add(self, host, rows):
+        with self.db:
+            self.db.executemany("INSERT OR IGNORE INTO samples VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                [(host, *row) for row in rows.get('raw', ())])
+            for resolution in ('1m', '1h'):
+                # A bucket pulled while still open is replaced by its final totals.
+                self.db.executemany(f"INSERT OR REPLACE INTO rollup_{resolution} VALUES (?, ?, ?, ?, ?, ?)",
+                                    [(host, *row) for row in rows.get(resolution, ())])
+
+    def summary(self, host, since, resolution='raw'):
+        """Latest score and the average/min over the window starting at `since`, from raw samples or a rollup."""
+        latest = self.db.execute("SELECT ts, score, penalties FROM samples WHERE host = ? ORDER BY ts DESC LIMIT 1",
+                                 (host,)).fetchone()
+        if resolution == 'raw':
+            count, average, minimum = self.db.execute(
+                "SELECT count(*), avg(score), min(score) FROM samples WHERE host = ? AND ts >= ?", (host, since)).fetchone()
+        else:
+            count, total, minimum = self.db.execute(
+                f"SELECT coalesce(sum(count), 0), sum(score_sum), min(score_min) FROM rollup_{resolution} "
+                f"WHERE host = ? AND bucket >= ?", (host, since)).fetchone()
+            average = total / count if count else None
+        return {
+            "host": host,
+            "latest_ts": latest[0] if latest else None,
+            "latest": latest[1] if latest else None,
+            "penalties": json.loads(latest[2]) if latest and latest[2] else {},
+            "average": round(average, 1) if average is not None else None,
+            "min": minimum,
+            "samples": count,
+        }
+
 @app.command()
 def deploy_sensor(
     target: str = typer.Argument(..., help="The target host in 'user@hostname' format."),
-    key_filename: str = typer.Option(None, "--key", "-k", help="Path to your private SSH key.")
+    key_filename: str = typer.Option(None, "--key", "-k", help="Path to your private SSH key."),
+    agent: bool = typer.Option(False, "--agent", help="Run the sensor as a resident systemd user service instead of a per-minute cron job.")
 ):
     """
     Deploys the System Maneuverability sensor to a target host.
     """
+    setup_logging()
     logging.info(f"Praetor: Initiating sensor deployment to {target}...")
-    
     try:
-        user, host = target.split('@')
-    except ValueError:
-        logging.error("Praetor: Invalid target format. Must be 'user@hostname'.")
+        SensorDeployment(target, key_filename).deploy(agent=agent)
+    except Exception as e:
+        logging.error(f"Praetor: Deployment to {target} failed: {e}")
         raise typer.Exit(code=1)
 
-    ssh = paramiko.SSHClient()
-    ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-    
+@app.command()
+def deploy(
+    inventory: str = typer.Argument(..., help="Inventory file: one 'user@hostname [key]' per line."),
+    key_filename: str = typer.Option(None, "--key", "-k", help="Private SSH key for hosts without one in the inventory."),
+    parallel: int = typer.Option(8, "--parallel", "-p", min=1, help="Maximum number of hosts deployed at once."),
+    agent: bool = typer.Option(False, "--agent", help="Run the sensor as a resident systemd user service instead of a per-minute cron job.")
+):
+    """
+    Deploys the System Maneuverability sensor to every host in an inventory, concurrently.
+    """
+    setup_logging()
     try:
-        logging.info(f"Connecting to {host} as {user}...")
-        ssh.connect(hostname=host, username=user, key_filename=key_filename)
-        sftp = ssh.open_sftp()
-        logging.info("Connection successful.")
-
-        remote_dir = f"/home/{user}/system_maneuverability"
-        logging.info(f"Creating remote directory: {remote_dir}")
-        sftp.mkdir(remote_dir)
-    except FileExistsError:
-        logging.info("Remote directory already exists.")
-    except Exception as e:
-        logging.error(f"Praetor: Failed to connect or create directory: {e}")
+        hosts = read_inventory(inventory)
+    except (OSError, ValueError) as e:
+        logging.error(f"Praetor: Could not read inventory: {e}")
         raise typer.Exit(code=1)
+    logging.info(f"Praetor: Deploying to {len(hosts)} host(s), {min(parallel, len(hosts) or 1)} at a time...")
 
+    def deploy_one(entry):
+        target, host_key = entry
+        try:
+            return target, SensorDeployment(target, host_key or key_filename).deploy(agent=agent), None
+        except Exception as e:
+            logging.error(f"Praetor: Deployment to {target} failed: {e}")
+            return target, None, e
+
+    with ThreadPoolExecutor(max_workers=parallel, thread_name_prefix="Praetor") as pool:
+        results = list(pool.map(deploy_one, hosts))
+    failed = [target for target, _, error in results if error]
+    logging.info(f"Praetor: Fleet deployment finished. {len(results) - len(failed)} succeeded, {len(failed)} failed.")
+    if failed:
+        logging.error(f"Praetor: Failed hosts: {', '.join(failed)}")
+        raise typer.Exit(code=1)
+
+@app.command()
+def scores(
+    hosts: str = typer.Argument(..., help="An inventory file, or a single 'user@hostname'."),
+    key_filename: str = typer.Option(None, "--key", "-k", help="Private SSH key for hosts without one in the inventory."),
+    parallel: int = typer.Option(8, "--parallel", "-p", min=1, help="Maximum number of hosts queried at once."),
+    hours: float = typer.Option(24.0, "--hours", help="Window, in hours, for the average and minimum."),
+    resolution: str = typer.Option("raw", "--resolution", help="Summarize raw samples (hosts keep 7 days) or the 1m (30 days) or 1h (400 days) rollups."),
+    as_json: bool = typer.Option(False, "--json", help="Print the summary as JSON."),
+    archive: str = typer.Option(FLEET_SCORES, "--archive", help="Local score archive (SQLite).")
+):
+    """
+    Pulls new SM score samples from each host into a local archive and summarizes them.
+    """
+    setup_logging()
+    if resolution not in RESOLUTIONS:
+        logging.error(f"Praetor: --resolution must be one of {', '.join(RESOLUTIONS)}.")
+        raise typer.Exit(code=2)
     try:
-        # Template and upload scripts
-        scripts_to_deploy = ["get_sm_score.py", "detect_gpu.sh", "log_sm_score.sh"]
-        for script_name in scripts_to_deploy:
-            logging.info(f"Deploying '{script_name}'...")
-            content = get_template(script_name)
-            if not content: continue
-            
-            # Replace the hardcoded home directory with the target user's home
-            templated_content = content.replace("/home/isidore", f"/home/{user}")
-            
-            remote_path = f"{remote_dir}/{script_name}"
-            with sftp.file(remote_path, 'w') as remote_file:
-                remote_file.write(templated_content)
-            
-            # Make the script executable
-            sftp.chmod(remote_path, 0o755)
-
-        # Set up the cron job
-        logging.info("Setting up cron job for log_sm_score.sh...")
-        cron_command = f"* * * * * {remote_dir}/log_sm_score.sh"
-        # This is the standard, idempotent way to add a cron job
-        stdin, stdout, stderr = ssh.exec_command(f'(crontab -l 2>/dev/null; echo "{cron_command}") | crontab -')
-        
-        if stdout.channel.recv_exit_status() != 0:
-            logging.error(f"Failed to set up cron job. STDERR: {stderr.read().decode()}")
-        else:
-            logging.info("Cron job successfully installed.")
+        entries = [(hosts, None)] if '@' in hosts and not os.path.exists(hosts) else read_inventory(hosts)
+    except (OSError, ValueError) as e:
+        logging.error(f"Praetor: Could not read inventory: {e}")
+        raise typer.Exit(code=1)
+    store = FleetScores(archive)
+    since = {target: store.latest(parse_target(target)[1]) for target, _ in entries}
 
-        logging.info("Praetor: Sensor deployment complete. Mutatis mutandis.")
+    def pull(entry):
+        target, host_key = entry
+        try:
+            # Only the samples after the newest one already archived cross the wire.
+            return target, SensorDeployment(target, host_key or key_filename).fetch_scores(since[target]), None
+        except Exception as e:
+            logging.error(f"Praetor: Could not pull scores from {target}: {e}")
+            return target, {}, e
 
-    finally:
-        sftp.close()
-        ssh.close()
-        logging.info("Connection closed.")
+    with ThreadPoolExecutor(max_workers=parallel, thread_name_prefix="Praetor") as pool:
+        results = list(pool.map(pull, entries))
+    window_start = time.time() - hours * 3600
+    summaries = []
+    for target, rows, error in results:
+        host = parse_target(target)[1]
+        store.add(host, rows)
+        summary = store.summary(host, window_start, resolution)
+        summary.update(new=len(rows.get('raw', ())), error=str(error) if error else None)
+        summaries.append(summary)
+    if as_json:
+        print(json.dumps(summaries, indent=2))
+    else:
+        print(f"{'HOST':<24} {'LATEST':>6} {'AVG':>6} {'MIN':>5} {'SAMPLES':>8} {'NEW':>6}  LAST SEEN")
+        cell = lambda value: '-' if value is None else value
+        for summary in summaries:
+            seen = time.strftime('%Y-%m-%d %H:%M', time.localtime(summary['latest_ts'])) if summary['latest_ts'] else '-'
+            print(f"{summary['host']:<24} {cell(summary['latest']):>6} {cell(summary['average']):>6} {cell(summary['min']):>5} "
+                  f"{summary['samples']:>8} {summary['new']:>6}  {seen}{'  (unreachable)' if summary['error'] else ''}")
+    if any(error for _, _, error in results):
+        raise typer.Exit(code=1)
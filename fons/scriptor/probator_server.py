@@ -0,0 +1,85 @@
+"""
+The warm Probator: a long-lived, per-project pytest host.
+
+The speculator starts one of these per project root and talks to it over
+its stdin/stdout pipe, one JSON object per line. The server pays for
+interpreter startup, the pytest import and plugin discovery once; every
+test session then runs in a forked child, so each run still starts from
+clean interpreter state and sees the files as they are on disk right now.
+
+    request:  {"args": ["tests/test_x.py"]}
+    response: {"returncode": 0, "stdout": "...", "stderr": "..."}
+"""
+import os
+import sys
+import json
+import tempfile
+
+def warm_up():
+    """Imports pytest, its internals and every installed pytest11 plugin."""
+    import pytest  # noqa: F401
+    import _pytest.assertion.rewrite  # noqa: F401
+    import _pytest.fixtures  # noqa: F401
+    import _pytest.main  # noqa: F401
+    import _pytest.python  # noqa: F401
+    import _pytest.terminal  # noqa: F401
+    try:
+        from importlib.metadata import entry_points
+        plugins = entry_points()
+        plugins = plugins.select(group='pytest11') if hasattr(plugins, 'select') else plugins.get('pytest11', [])
+        for plugin in plugins:
+            try:
+                plugin.load()
+            except Exception:
+                pass  # A broken plugin fails loudly inside the session instead.
+    except ImportError:
+        pass
+
+def run_session(args):
+    """Forks a child that runs one pytest session; returns (returncode, stdout, stderr)."""
+    with tempfile.TemporaryFile() as out, tempfile.TemporaryFile() as err:
+        pid = os.fork()
+        if pid == 0:
+            code = 3  # pytest's "internal error"
+            try:
+                os.dup2(out.fileno(), 1)
+                os.dup2(err.fileno(), 2)
+                sys.stdout = sys.__stdout__  # serve() points sys.stdout at stderr.
+                sys.stdin = open(os.devnull)
+                import pytest
+                code = int(pytest.main(list(args)))
+            except BaseException:
+                import traceback
+                traceback.print_exc()
+            finally:
+                sys.stdout.flush()
+                sys.stderr.flush()
+                os._exit(code)
+        _, status = os.waitpid(pid, 0)
+        returncode = os.WEXITSTATUS(status) if os.WIFEXITED(status) else -os.WTERMSIG(status)
+        out.seek(0)
+        err.seek(0)
+        return (returncode,
+                out.read().decode('utf-8', 'replace'),
+                err.read().decode('utf-8', 'replace'))
+
+def serve():
+    # Behave like the 'pytest' console script: the project root is not on sys.path
+    # unless the project's own configuration puts it there.
+    if sys.path and sys.path[0] in ('', os.getcwd()):
+        sys.path.pop(0)
+    warm_up()
+    reply = sys.stdout
+    sys.stdout = sys.stderr  # Keep stray prints off the protocol pipe.
+    reply.write(json.dumps({"ready": True}) + "\n")
+    reply.flush()
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        request = json.loads(line)
+        returncode, stdout, stderr = run_session(request.get("args", []))
+        reply.write(json.dumps({"returncode": returncode, "stdout": stdout, "stderr": stderr}) + "\n")
+        reply.flush()
+
+if __name__ == "__main__":
+    serve()
@@ -1,39 +1,379 @@
 import os
+import ast
+import json
+import time
+import threading
 import subprocess
 import logging
 import sys
+from .acta import log_output
+
+# --- Test-impact selection ---
+# Directories that never hold project sources worth mapping.
+IGNORED_DIRS = {'.git', '.hg', '.tox', '.nox', '.venv', 'venv', '__pycache__', '.pytest_cache',
+                '.mypy_cache', '.ruff_cache', 'node_modules', 'build', 'dist'}
+# How often (in seconds) an impacted-only Probator still runs the full suite per project.
+FULL_RUN_INTERVAL = 3600
+
+# --- Project-root resolution, cached and shared by compara, Perfector, Ornator and Probator ---
+# Files whose appearance or disappearance can move a project root.
+ROOT_MARKERS = ('.git', 'pyproject.toml')
+# Files whose contents feed ProjectInfo.
+CONFIG_FILES = ('pyproject.toml', 'pytest.ini', 'tox.ini', 'setup.cfg', 'ruff.toml', '.ruff.toml')
+FORMATTER_CONFIGS = ('pyproject.toml', 'ruff.toml', '.ruff.toml')
+
+class ProjectInfo:
+    """Facts about a project root that several pipeline stages need."""
+    def __init__(self, root):
+        self.root = root
+        pyproject = os.path.join(root, 'pyproject.toml')
+        self.pyproject = pyproject if os.path.isfile(pyproject) else None
+        # Files whose contents can change what black or ruff make of a source file.
+        self.formatter_configs = [os.path.join(root, name) for name in FORMATTER_CONFIGS
+                                  if os.path.isfile(os.path.join(root, name))]
+
+class RootCache:
+    """
+    Memoises find_project_root per directory. Every directory visited on
+    the way up is remembered, so later lookups from anywhere beneath a
+    known root cost one dict hit instead of a stat per level. Entries are
+    dropped by invalidate() when a marker file appears or disappears; the
+    speculator wires that to watchdog events on the visited directories,
+    which it learns about through the listeners.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.roots = {}  # directory -> project root (or None)
+        self.infos = {}  # project root -> ProjectInfo
+        self.listeners = []  # callables taking a list of newly visited directories
+
+    def resolve(self, start_path):
+        start_path = os.path.abspath(start_path)
+        with self.lock:
+            if start_path in self.roots:
+                return self.roots[start_path]
+        # Using os.path.realpath to resolve any symlinks for robustness
+        current_path = os.path.realpath(start_path)
+        visited = []
+        with self.lock:
+            while True:
+                if current_path in self.roots:
+                    root = self.roots[current_path]
+                    break
+                visited.append(current_path)
+                if os.path.isdir(os.path.join(current_path, '.git')) or \
+                   os.path.isfile(os.path.join(current_path, 'pyproject.toml')):
+                    root = current_path
+                    break
+                parent_path = os.path.dirname(current_path)
+                if parent_path == current_path: # Reached the filesystem root
+                    root = None
+                    break
+                current_path = parent_path
+            for directory in visited:
+                self.roots[directory] = root
+            self.roots[start_path] = root  # realpath() itself stats every component.
+            listeners = list(self.listeners)
+        if visited:
+            for listener in listeners:
+                listener(visited)
+        return root
+
+    def info(self, root):
+        with self.lock:
+            info = self.infos.get(root)
+        if info is None:
+            info = ProjectInfo(root)
+            with self.lock:
+                self.infos[root] = info
+        return info
+
+    def invalidate(self, directory):
+        """A root marker changed in directory: forget every answer that walked through it."""
+        directory = os.path.realpath(directory)
+        prefix = directory.rstrip(os.sep) + os.sep
+        with self.lock:
+            for cached in [d for d in self.roots if d == directory or d.startswith(prefix)]:
+                del self.roots[cached]
+            for root in [r for r in self.infos if r == directory or r.startswith(prefix)]:
+                del self.infos[root]
+
+    def forget_info(self, directory):
+        """A config file changed in directory: rebuild its ProjectInfo on next use."""
+        with self.lock:
+            self.infos.pop(os.path.realpath(directory), None)
+
+ROOT_CACHE = RootCache()
 
 def find_project_root(start_path):
     """
     Finds the project root by searching upwards for a .git directory
     or a pyproject.toml file.
     """
-    # Using os.path.realpath to resolve any symlinks for robustness
-    current_path = os.path.realpath(start_path)
-    while True:
-        if os.path.isdir(os.path.join(current_path, '.git')) or \
-           os.path.isfile(os.path.join(current_path, 'pyproject.toml')):
-            return current_path
-        
-        parent_path = os.path.dirname(current_path)
-        if parent_path == current_path: # Reached the filesystem root
+    return ROOT_CACHE.resolve(start_path)
+
+def project_info(start_path):
+    """Returns the ProjectInfo for the project containing start_path, or None."""
+    root = find_project_root(start_path)
+    return ROOT_CACHE.info(root) if root else None
+
+def is_test_file(path):
+    name = os.path.basename(path)
+    return name.endswith('.py') and (name.startswith('test_') or name.endswith('_test.py'))
+
+def module_names(project_root, path):
+    """
+    Returns every dotted name a file could be imported as from within the
+    project: its full path from the root plus each shorter suffix, so that
+    'src/' layouts and sys.path tweaks in conftest are still matched.
+    """
+    parts = os.path.relpath(path, project_root)[:-len('.py')].split(os.sep)
+    if parts[-1] == '__init__':
+        parts = parts[:-1]
+    return {'.'.join(parts[i:]) for i in range(len(parts))}
+
+def parse_imports(project_root, path):
+    """Returns the set of dotted module names a file imports, or None if it cannot be parsed."""
+    try:
+        with open(path, 'rb') as f:
+            tree = ast.parse(f.read(), filename=path)
+    except (OSError, SyntaxError, ValueError):
+        return None
+    package = os.path.relpath(path, project_root)[:-len('.py')].split(os.sep)[:-1]
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            bases = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom):
+            base = node.module.split('.') if node.module else []
+            if node.level:
+                base = package[:len(package) - (node.level - 1)] + base
+            base = '.'.join(base)
+            bases = [f"{base}.{alias.name}" if base else alias.name for alias in node.names]
+        else:
+            continue
+        for name in bases:
+            # Importing 'a.b.c' also executes 'a' and 'a.b'.
+            parts = name.split('.')
+            names.update('.'.join(parts[:i]) for i in range(1, len(parts) + 1))
+    return names
+
+class ImpactMap:
+    """
+    A per-project map from source modules to the test files that import
+    them, directly or transitively. Built from a static import graph and
+    refreshed incrementally: only files whose mtime changed are re-parsed.
+    """
+    def __init__(self, project_root):
+        self.project_root = project_root
+        self.files = {}  # path -> (mtime_ns, imported names or None)
+        self.lock = threading.Lock()
+
+    def refresh(self):
+        seen = {}
+        for dirpath, dirnames, filenames in os.walk(self.project_root):
+            dirnames[:] = [d for d in dirnames if d not in IGNORED_DIRS and not d.endswith('.egg-info')]
+            for filename in filenames:
+                if not filename.endswith('.py'):
+                    continue
+                path = os.path.join(dirpath, filename)
+                try:
+                    mtime = os.stat(path).st_mtime_ns
+                except OSError:
+                    continue
+                cached = self.files.get(path)
+                if cached and cached[0] == mtime:
+                    seen[path] = cached
+                else:
+                    seen[path] = (mtime, parse_imports(self.project_root, path))
+        self.files = seen
+
+    def impacted_tests(self, target_file):
+        """
+        Returns the sorted list of test files affected by a change to
+        target_file, or None when the impact cannot be determined and the
+        full suite must run.
+        """
+        target_file = os.path.realpath(target_file)
+        if not target_file.endswith('.py') or os.path.basename(target_file) == 'conftest.py':
+            return None
+        with self.lock:
+            self.refresh()
+            if self.files.get(target_file, (None, None))[1] is None:
+                return None
+            index = {}
+            for path in self.files:
+                for name in module_names(self.project_root, path):
+                    index.setdefault(name, set()).add(path)
+            importers = {}
+            for path, (_, names) in self.files.items():
+                for name in names or ():
+                    for dependency in index.get(name, ()):
+                        if dependency != path:
+                            importers.setdefault(dependency, set()).add(path)
+        impacted, frontier = {target_file}, [target_file]
+        while frontier:
+            for importer in importers.get(frontier.pop(), ()):
+                if importer not in impacted:
+                    impacted.add(importer)
+                    frontier.append(importer)
+        # Tests reach a conftest through pytest, not through imports: every
+        # test beneath an impacted conftest is impacted too.
+        scopes = [os.path.dirname(path) + os.sep for path in impacted if os.path.basename(path) == 'conftest.py']
+        return sorted(path for path in self.files
+                      if is_test_file(path) and (path in impacted or any(path.startswith(scope) for scope in scopes)))
+
+_impact_maps = {}
+_last_full_run = {}
+_impact_lock = threading.Lock()
+
+def get_impact_map(project_root):
+    with _impact_lock:
+        if project_root not in _impact_maps:
+            _impact_maps[project_root] = ImpactMap(project_root)
+        return _impact_maps[project_root]
+
+def request_full_run(project_root=None):
+    """Forces the next verification of a project (or of every project) to run the full suite."""
+    with _impact_lock:
+        if project_root:
+            _last_full_run.pop(project_root, None)
+        else:
+            _last_full_run.clear()
+
+def select_tests(project_root, target_files):
+    """
+    Decides what an impacted-only Probator should run. Returns None for a
+    full run, otherwise the non-empty list of impacted test files.
+    """
+    with _impact_lock:
+        last_full_run = _last_full_run.get(project_root)
+    if last_full_run is None or time.time() - last_full_run >= FULL_RUN_INTERVAL:
+        logging.info("Probator: Scheduled full run of the test suite.")
+        return None
+    impact_map = get_impact_map(project_root)
+    tests = set()
+    for target_file in target_files:
+        impacted = impact_map.impacted_tests(target_file)
+        if impacted is None:
+            logging.info("Probator: Impact of this change is unknown. Running the full suite.")
             return None
-        current_path = parent_path
+        tests.update(impacted)
+    if not tests:
+        # Nothing imports the change that we can see; that is no proof it is safe.
+        logging.info("Probator: No tests import the changed module. Running the full suite.")
+        return None
+    return sorted(tests)
+
+# --- Warm Probator: one long-lived pytest host per project ---
+class WarmRunner:
+    """
+    Client for a scriptor.probator_server process rooted at a project.
+    The server keeps pytest and its plugins imported and forks a fresh
+    child for every session, so only collection and the tests themselves
+    are paid per patch.
+    """
+    def __init__(self, project_root):
+        self.project_root = project_root
+        self.process = None
+        self.lock = threading.Lock()
+
+    def start(self):
+        package_parent = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        env = dict(os.environ)
+        env['PYTHONPATH'] = os.pathsep.join(filter(None, [package_parent, env.get('PYTHONPATH')]))
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "scriptor.probator_server"],
+            cwd=self.project_root, env=env, text=True, bufsize=1,
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+        )
+        if not self.process.stdout.readline():
+            raise RuntimeError("warm Probator exited during startup")
+        logging.info(f"Probator: Warm runner started for '{self.project_root}' (pid {self.process.pid}).")
+
+    def run(self, args):
+        """Runs one pytest session; returns (returncode, stdout, stderr)."""
+        with self.lock:
+            for attempt in (1, 2):
+                if self.process is None or self.process.poll() is not None:
+                    self.start()
+                try:
+                    self.process.stdin.write(json.dumps({"args": args}) + "\n")
+                    self.process.stdin.flush()
+                    line = self.process.stdout.readline()
+                    if line:
+                        reply = json.loads(line)
+                        return reply["returncode"], reply["stdout"], reply["stderr"]
+                except (OSError, ValueError):
+                    pass
+                logging.warning("Probator: Warm runner died. Restarting it.")
+                self.stop()
+            raise RuntimeError("warm Probator is not responding")
+
+    def stop(self):
+        if self.process is not None:
+            try:
+                self.process.stdin.close()
+                self.process.wait(timeout=5)
+            except Exception:
+                self.process.kill()
+            self.process = None
+
+_warm_runners = {}
+
+def get_warm_runner(project_root):
+    with _impact_lock:
+        if project_root not in _warm_runners:
+            _warm_runners[project_root] = WarmRunner(project_root)
+        return _warm_runners[project_root]
+
+def stop_warm_runners():
+    with _impact_lock:
+        runners = list(_warm_runners.values())
+        _warm_runners.clear()
+    for runner in runners:
+        runner.stop()
+
+def run_pytest(project_root, args, warm=False):
+    """Runs one pytest session in project_root; returns (returncode, stdout, stderr)."""
+    if warm and hasattr(os, 'fork'):
+        try:
+            return get_warm_runner(project_root).run(args)
+        except Exception as e:
+            logging.warning(f"Probator: Warm runner unavailable ({e}). Falling back to a cold pytest run.")
+    venv_bin_dir = os.path.dirname(sys.executable)
+    pytest_path = os.path.join(venv_bin_dir, "pytest")
+    result = subprocess.run(
+        [pytest_path] + args,
+        cwd=project_root,
+        capture_output=True,
+        text=True
+    )
+    return result.returncode, result.stdout, result.stderr
 
-def run_tests(target_file):
+def run_tests(target_file, impacted=False, warm=False):
     """
-    Probator: Runs pytest in the project root of the target file.
+    Probator: Runs pytest in the project root of the target file (or of
+    the first of a list of target files from the same project).
     Returns True if tests pass or no tests are found, False otherwise.
+    With impacted=True only the tests that import the target (directly or
+    transitively) are run, with a full run every FULL_RUN_INTERVAL seconds.
+    With warm=True the session runs in the project's warm Probator.
     """
     logging.info("Probator: Verifying patch integrity...")
+    target_files = [target_file] if isinstance(target_file, str) else list(target_file)
     
-    project_root = find_project_root(os.path.dirname(target_file))
+    project_root = find_project_root(os.path.dirname(target_files[0]))
 
     if not project_root:
         logging.warning("Probator: Could not determine project root. Skipping tests.")
         return True # If we can't find a project, we can't run tests, so we assume success.
 
-    logging.info(f"Probator: Found project root at '{project_root}'. Running pytest...")
+    tests = select_tests(project_root, target_files) if impacted else None
+    if tests is None:
+        logging.info(f"Probator: Found project root at '{project_root}'. Running pytest...")
+    else:
+        logging.info(f"Probator: Found project root at '{project_root}'. Running {len(tests)} impacted test file(s)...")
 
     try:
         # Determine the absolute path to the pytest executable within the current venv
@@ -48,25 +388,27 @@ def run_tests(target_file):
         # '--no-test-found-exit-code=5' is a pytest 8+ feature. We'll use a more compatible approach.
         # We will check the exit code directly. Pytest exits with 5 if no tests are found.
         # We remove `check=True` so the command doesn't raise an exception on non-zero exit codes.
-        result = subprocess.run(
-            [pytest_path],
-            cwd=project_root,
-            capture_output=True,
-            text=True
+        started = time.time()
+        returncode, stdout, stderr = run_pytest(
+            project_root, [os.path.relpath(test, project_root) for test in tests or []], warm=warm
         )
 
         # Success is either exit code 0 (tests passed) or 5 (no tests found).
-        if result.returncode == 0 or result.returncode == 5:
-            if result.returncode == 5:
+        if returncode == 0 or returncode == 5:
+            if tests is None and impacted:
+                with _impact_lock:
+                    _last_full_run[project_root] = started
+            if returncode == 5:
                 logging.info("Probator: No tests were found.")
             logging.info("Probator: Verification successful.")
             return True
         else:
             # Any other non-zero exit code is a failure.
             logging.error("Probator: Tests FAILED. Reversion is necessary.")
-            # Combine stdout and stderr for a complete failure log
-            error_summary = f"STDOUT:\n{result.stdout}\n\nSTDERR:\n{result.stderr}"
-            logging.error(f"Probator: Pytest failure summary:\n{error_summary}")
+            # Combine stdout and stderr for a complete failure log, kept out of the main log.
+            last_line = next((line for line in reversed(stdout.splitlines()) if line.strip()), "")
+            log_output(f"Probator: Pytest failure summary: {last_line.strip('= ')}",
+                       f"STDOUT:\n{stdout}\n\nSTDERR:\n{stderr}")
             return False
 
     except Exception as e:
@@ -1,131 +1,670 @@
 import os
 import time
-import subprocess
-import sys
 import logging
-import queue
 import threading
+import itertools
 import logging.handlers
 import shutil
+import signal
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
 import typer # <-- NEW
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
-from .perfector import perfice_resarcio
-from .probator_tool import run_tests
+from .perfector import perfice_resarcio, read_target, read_targets, write_atomically, BACKUP_SUFFIX
+from .tabularium import Tabularium, recover
+from .ornator import orna
+from .mensura import METRICS, Span, setup_spans, serve_metrics
+from .praegustator import scratch_trees
+from .ordo import Ticket
+from . import acta
+from . import probator_tool
+from .probator_tool import run_tests, find_project_root, ROOT_CACHE, ROOT_MARKERS, CONFIG_FILES
 
 app = typer.Typer(name="speculator", help="The autonomous daemon. Watches the inbox and processes patches.")
 SCRIBO_INBOX = os.path.expanduser("~/scribo_inbox")
 QUARANTINE_DIR = os.path.join(SCRIBO_INBOX, "quarantine")
+SCRATCH_DIR = os.path.join(SCRIBO_INBOX, ".scratch")
+SUPERSEDED_DIR = os.path.join(SCRIBO_INBOX, "superseded")
+MAX_CONFLICTS = 3  # Speculative rounds lost to outside edits before falling back to live application.
 LOG_FILE = os.path.join(SCRIBO_INBOX, "Acta_Scriptoris.log")
 
-# --- Logger Setup (unchanged, but moved for clarity) ---
+# --- Logger Setup: handlers run on the Acta listener thread ---
 def setup_logging():
     logger = logging.getLogger()
     if logger.hasHandlers(): # Prevent adding handlers multiple times
         return
     logger.setLevel(logging.INFO)
-    log_formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+    log_formatter = logging.Formatter('%(asctime)s - %(levelname)s - [%(threadName)s] %(message)s')
     file_handler = logging.handlers.RotatingFileHandler(
         LOG_FILE, maxBytes=10485760, backupCount=5
     )
     file_handler.setFormatter(log_formatter)
     console_handler = logging.StreamHandler()
     console_handler.setFormatter(log_formatter)
-    logger.addHandler(file_handler)
-    logger.addHandler(console_handler)
+    acta.start(SCRIBO_INBOX, [file_handler, console_handler])
 
-# --- Operarius and PatchHandler Classes (unchanged) ---
+# --- Dispatcher: per-project lanes feeding the Operarius pool ---
+class Dispatcher:
+    """
+    Routes patches into one lane per project root. A lane is handed to at
+    most one Operarius at a time, so patches for the same project are
+    never applied concurrently, while lanes for different projects are
+    worked concurrently. Within a lane, and among ready lanes, the patch
+    with the lowest Ordo rank (priority, then deadline, then arrival)
+    goes first, but never ahead of a queued patch for the same file. A
+    queued patch that a newer one supersedes is moved aside unverified.
+    """
+    def __init__(self, journal=None):
+        self.lock = threading.Lock()
+        self.available = threading.Condition(self.lock)
+        self.lanes = {}  # key -> Tickets, in the order they will be worked
+        self.busy = {}   # key -> how many tickets at the head of the lane a worker holds
+        self.stops = 0
+        self.seq = itertools.count()
+        self.journal = journal
+        self.queued_at = {}  # patch path -> when it was put, for queue-wait spans
+
+    def route(self, patch_path):
+        target = read_target(patch_path)
+        if not target:
+            return ''  # Unroutable patches share one lane; the Operarius quarantines them.
+        return find_project_root(os.path.dirname(target)) or os.path.dirname(target)
+
+    def put(self, patch_path):
+        key = self.route(patch_path)
+        ticket = Ticket(patch_path, next(self.seq))
+        with self.lock:
+            if self.journal:
+                self.journal.record("queued", patch_path)
+            self.queued_at.setdefault(patch_path, time.monotonic())
+            lane = self.lanes.setdefault(key, [])
+            held = self.busy.get(key, 0)
+            stale = [t for t in lane[held:] if t.patch_path == patch_path or ticket.supersedes(t)]
+            for old in stale:
+                lane.remove(old)
+            position = len(lane)
+            while position > held and ticket.rank() < lane[position - 1].rank() and not ticket.depends_on(lane[position - 1]):
+                position -= 1
+            lane.insert(position, ticket)
+            self.available.notify()
+        for old in stale:
+            if old.patch_path != patch_path:
+                self.supersede(old, ticket)
+
+    def supersede(self, stale, ticket):
+        name = os.path.basename(stale.patch_path)
+        self.queued_at.pop(stale.patch_path, None)
+        if not os.path.exists(stale.patch_path):
+            return
+        os.makedirs(SUPERSEDED_DIR, exist_ok=True)
+        shutil.move(stale.patch_path, os.path.join(SUPERSEDED_DIR, name))
+        if self.journal:
+            self.journal.record("done", stale.patch_path, "superseded")
+        METRICS.count("superseded")
+        logging.info(f"Dispatcher: '{name}' is superseded by '{os.path.basename(ticket.patch_path)}'. Skipping it.",
+                     extra={'patches': (name,), 'status': 'superseded'})
+
+    def take(self):
+        """Waits for a lane no worker holds and returns the one whose head ranks first, or None on shutdown."""
+        while True:
+            if self.stops:
+                self.stops -= 1
+                return None
+            ready = [key for key in self.lanes if key not in self.busy]
+            if ready:
+                key = min(ready, key=lambda k: self.lanes[k][0].rank())
+                head = self.lanes[key][0]
+                if head.deadline is not None and head.deadline < time.time():
+                    logging.warning(f"Dispatcher: '{os.path.basename(head.patch_path)}' missed its deadline "
+                                    f"by {time.time() - head.deadline:.1f}s.")
+                return key
+            self.available.wait()
+
+    def get(self):
+        """Blocks until a lane is ready. Returns (key, patch_path), or (None, None) on shutdown."""
+        with self.lock:
+            key = self.take()
+            if key is None:
+                return None, None
+            # The patch stays at the head of its lane until task_done(), which
+            # marks the lane as busy and keeps other workers off it.
+            self.busy[key] = 1
+            return key, self.lanes[key][0].patch_path
+
+    def get_batch(self):
+        """Like get(), but hands over every patch currently queued in the lane."""
+        with self.lock:
+            key = self.take()
+            if key is None:
+                return None, []
+            self.busy[key] = len(self.lanes[key])
+            return key, [ticket.patch_path for ticket in self.lanes[key]]
+
+    def task_done(self, key, count=1):
+        with self.lock:
+            lane = self.lanes[key]
+            del lane[:count]
+            del self.busy[key]
+            if lane:
+                self.available.notify()
+            else:
+                del self.lanes[key]
+            if not self.lanes and self.journal:
+                self.journal.reset()  # Nothing queued or in flight: the history can go.
+
+    def waited(self, patch_paths):
+        """Returns how long the longest-waiting of patch_paths sat in its lane."""
+        now = time.monotonic()
+        with self.lock:
+            return max((now - self.queued_at.pop(p, now) for p in patch_paths), default=0.0)
+
+    def depth(self):
+        """Patches queued or in flight, across all lanes."""
+        with self.lock:
+            return sum(len(lane) for lane in self.lanes.values())
+
+    def stop(self, workers):
+        with self.lock:
+            self.stops += workers
+            self.available.notify_all()
+
+# --- Operarius and PatchHandler Classes ---
 class Operarius(threading.Thread):
-    # ... (This entire class is unchanged) ...
-    def __init__(self, work_queue):
-        super().__init__()
-        self.work_queue = work_queue
+    def __init__(self, dispatcher, name=None, impacted=False, warm=False, coalesce=False, scratch=0):
+        super().__init__(name=name)
+        self.dispatcher = dispatcher
+        self.impacted = impacted
+        self.warm = warm
+        self.coalesce = coalesce
+        self.scratch = scratch
+        self.journal = dispatcher.journal
+        self.span = None
         self.daemon = True
     def run(self):
         logging.info("Operarius: Worker thread started. Awaiting tasks.")
         while True:
-            patch_path = self.work_queue.get()
-            if patch_path is None: break
-            self.process_patch(patch_path)
-            self.work_queue.task_done()
+            if self.coalesce or self.scratch:
+                key, patch_paths = self.dispatcher.get_batch()
+            else:
+                key, patch_path = self.dispatcher.get()
+                patch_paths = [patch_path] if patch_path else []
+            if not patch_paths: break
+            self.span = Span(patch_paths, self.name, self.dispatcher.waited(patch_paths))
+            try:
+                with acta.patch_context(patch_paths):
+                    self.process(key, patch_paths)
+            except Exception as e:
+                logging.critical(f"Operarius: Unhandled error while processing '{os.path.basename(patch_paths[0])}': {e}")
+            finally:
+                self.span.finish()
+                self.span = None
+                self.dispatcher.task_done(key, len(patch_paths))
+    def process(self, key, patch_paths):
+        if self.scratch:
+            self.process_speculative(key, patch_paths)
+        elif len(patch_paths) == 1:
+            self.process_patch(patch_paths[0])
+        else:
+            self.process_batch(patch_paths)
+    def note(self, op, patch_path, outcome=None):
+        if self.journal:
+            self.journal.record(op, patch_path, outcome)
+        if op == "done":
+            logging.info(f"Operarius: '{os.path.basename(patch_path)}' is {outcome}.",
+                         extra={'patches': (os.path.basename(patch_path),), 'status': outcome})
+            METRICS.count(outcome)
+            if self.span:
+                self.span.outcome(patch_path, outcome)
+    def stage(self, name):
+        return self.span.stage(name) if self.span else contextlib.nullcontext()
+    def apply(self, patch_path):
+        with self.stage("apply"):
+            return perfice_resarcio(patch_path, backup_suffix=BACKUP_SUFFIX)
     def process_patch(self, patch_path):
         logging.info(f"Operarius: Processing '{os.path.basename(patch_path)}'.")
-        time.sleep(0.1)
         if not os.path.exists(patch_path):
             logging.warning(f"Operarius: Patch file disappeared: {patch_path}")
             return
-        with open(patch_path, 'r') as f:
-            header = f.readline()
-        if not header.startswith('--- target: '):
+        target_files = read_targets(patch_path)
+        if not target_files:
             logging.error(f"Operarius: Invalid patch header. Quarantining.")
             self.quarantine(patch_path)
             return
-        target_file = header.split('--- target: ')[1].strip()
-        temp_backup_path = target_file + ".scribo_bak"
-        shutil.copy(target_file, temp_backup_path)
-        logging.info("Probator: Created temporary backup.")
-        if not perfice_resarcio(patch_path):
+        self.note("begin", patch_path)
+        backups = self.backup_paths(target_files)
+        if not self.apply(patch_path):
             logging.error(f"Operarius: Patch failed. Reverting.")
-            self.revert_and_quarantine(target_file, temp_backup_path, patch_path)
+            self.revert_and_quarantine(backups, patch_path, "quarantined")
             return
-        self.run_ornator(target_file)
-        if not run_tests(target_file):
+        for target_file in target_files:
+            self.run_ornator(target_file)
+        if not self.run_probator(target_files):
             logging.error(f"Operarius: Tests failed. Reverting.")
-            self.revert_and_quarantine(target_file, temp_backup_path, patch_path)
+            self.revert_and_quarantine(backups, patch_path)
             return
-        os.remove(temp_backup_path)
+        self.note("done", patch_path, "applied")
+        for backup in backups.values():
+            if os.path.exists(backup):
+                os.remove(backup)
         os.remove(patch_path)
         logging.info("Operarius: Mutatis mutandis. Scriptor has perfected and verified the file.")
-    def revert_and_quarantine(self, target, backup, patch):
+    def backup_paths(self, target_files):
+        """
+        Maps each target to its backup path. The Perfector creates the backup
+        itself, as a hard link to the pre-patch inode, on its first write.
+        """
+        return {target_file: target_file + BACKUP_SUFFIX for target_file in target_files}
+    def run_probator(self, target_files):
+        """Runs the Probator once per project root touched by target_files."""
+        projects = {}
+        for target_file in target_files:
+            directory = os.path.dirname(target_file)
+            projects.setdefault(find_project_root(directory) or directory, []).append(target_file)
+        with self.stage("probator"):
+            return all(run_tests(files, impacted=self.impacted, warm=self.warm) for files in projects.values())
+    # --- Coalesced batches: one backup, one format and one test run for N patches ---
+    def process_batch(self, patch_paths):
+        logging.info(f"Operarius: Coalescing {len(patch_paths)} queued patches into one verification.")
+        entries = self.read_entries(patch_paths)
+        if not entries:
+            return
+        for patch_path, _ in entries:
+            self.note("begin", patch_path)
+        backups = self.backup_paths([t for _, target_files in entries for t in target_files])
         try:
-            shutil.move(backup, target)
-            self.quarantine(patch)
+            self.verify_batch(entries, backups)
+        except Exception:
+            self.restore_backups(backups)
+            raise
+        finally:
+            for backup in backups.values():
+                if os.path.exists(backup):
+                    os.remove(backup)
+
+    def read_entries(self, patch_paths):
+        """Returns (patch_path, target_files) for each usable patch, quarantining invalid ones."""
+        entries = []
+        for patch_path in patch_paths:
+            if not os.path.exists(patch_path):
+                logging.warning(f"Operarius: Patch file disappeared: {patch_path}")
+                continue
+            target_files = read_targets(patch_path)
+            if not target_files:
+                logging.error(f"Operarius: Invalid patch header in '{os.path.basename(patch_path)}'. Quarantining.")
+                self.quarantine(patch_path)
+                continue
+            entries.append((patch_path, target_files))
+        return entries
+
+    def verify_batch(self, entries, backups):
+        """Applies, formats and tests entries as one unit; bisects to the offender on failure."""
+        while entries:
+            applied = self.apply_batch(entries, backups, quarantine_failures=True)
+            if not applied:
+                return
+            if self.batch_passes(applied):
+                for patch_path, _ in applied:
+                    self.note("done", patch_path, "applied")
+                for patch_path, _ in applied:
+                    os.remove(patch_path)
+                logging.info(f"Operarius: Mutatis mutandis. {len(applied)} coalesced patch(es) perfected and verified.")
+                return
+            logging.error(f"Operarius: Coalesced tests failed. Bisecting {len(applied)} patch(es).")
+            # Invariant: the empty prefix passes and applied[:hi + 1] fails.
+            lo, hi = 0, len(applied) - 1
+            while lo < hi:
+                mid = (lo + hi) // 2
+                if self.apply_batch(applied[:mid + 1], backups) and self.batch_passes(applied[:mid + 1]):
+                    lo = mid + 1
+                else:
+                    hi = mid
+            offender = applied[lo][0]
+            logging.error(f"Operarius: Bisection isolated '{os.path.basename(offender)}'. Quarantining it.")
+            self.restore_backups(backups)
+            self.quarantine(offender, "reverted")
+            entries = applied[:lo] + applied[lo + 1:]
+        self.restore_backups(backups)
+
+    def apply_batch(self, entries, backups, quarantine_failures=False):
+        """Restores the backups, then applies entries in order. Returns the entries that applied."""
+        self.restore_backups(backups)
+        applied = []
+        for patch_path, target_files in entries:
+            if self.apply(patch_path):
+                applied.append((patch_path, target_files))
+                continue
+            if not quarantine_failures:
+                return []
+            logging.error(f"Operarius: Patch '{os.path.basename(patch_path)}' failed to apply. Quarantining.")
+            self.quarantine(patch_path)
+            # Undo any partial application before carrying on with the rest of the batch.
+            self.restore_backups(backups)
+            for good_patch, _ in applied:
+                self.apply(good_patch)
+        for target_file in self.batch_targets(applied):
+            self.run_ornator(target_file)
+        return applied
+
+    def batch_targets(self, entries):
+        return list(dict.fromkeys(t for _, target_files in entries for t in target_files))
+
+    def batch_passes(self, entries):
+        return self.run_probator(self.batch_targets(entries))
+
+    # --- Speculative verification: candidates tasted in parallel scratch trees ---
+    def process_speculative(self, root, patch_paths):
+        """
+        Verifies up to `scratch` queued patches at once, each in its own
+        scratch tree on top of the ones queued before it, then serves the
+        verified results to the project in queue order. After a failure the
+        candidates behind it were verified against the wrong base, so they
+        are tasted again in the next round.
+        """
+        entries = self.read_entries(patch_paths)
+        trees = scratch_trees(root, SCRATCH_DIR, self.scratch) if root else []
+        if trees and any(not trees[0].contains(t) for _, target_files in entries for t in target_files):
+            trees = []
+        if not trees:
+            for patch_path, _ in entries:
+                self.process_patch(patch_path)
+            return
+        conflicts = 0
+        while entries:
+            candidates = entries[:len(trees)]
+            logging.info(f"Operarius: Tasting {len(candidates)} patch(es) in scratch trees.")
+            expected = {t: self.snapshot(t) for _, target_files in candidates for t in target_files}
+            with self.stage("speculate"), ThreadPoolExecutor(max_workers=len(candidates)) as pool:
+                verdicts = list(pool.map(lambda k: self.taste(trees[k], candidates[:k + 1]), range(len(candidates))))
+            settled = 0
+            for tree, (patch_path, target_files), verdict in zip(trees, candidates, verdicts):
+                if verdict not in ("applied", None):
+                    logging.error(f"Operarius: '{os.path.basename(patch_path)}' "
+                                  f"{'failed to apply' if verdict == 'quarantined' else 'failed its tests'}. Quarantining.")
+                    self.quarantine(patch_path, verdict)
+                    settled += 1
+                    break
+                if verdict is None or not self.serve(tree, patch_path, target_files, expected):
+                    conflicts += 1
+                    logging.warning(f"Operarius: Targets of '{os.path.basename(patch_path)}' changed during verification. "
+                                    f"Tasting again ({conflicts}/{MAX_CONFLICTS}).")
+                    break
+                settled += 1
+            entries = entries[settled:]
+            if conflicts >= MAX_CONFLICTS:
+                logging.warning("Operarius: Too many conflicting edits. Applying the rest of the lane directly.")
+                for patch_path, _ in entries:
+                    self.process_patch(patch_path)
+                return
+
+    def taste(self, tree, entries):
+        """
+        Applies and formats entries in order in tree, then tests the last
+        one. Returns its verdict: 'applied', 'quarantined' (it did not
+        apply) or 'reverted' (its tests failed); None if an earlier entry
+        did not apply, in which case that entry's own verdict decides.
+        """
+        with acta.patch_context([entries[-1][0]]):
+            return self.taste_in(tree, entries)
+
+    def taste_in(self, tree, entries):
+        tree.sync()
+        for i, (patch_path, target_files) in enumerate(entries):
+            with self.stage("apply"):
+                applied = perfice_resarcio(patch_path, redirect=tree.map)
+            if not applied:
+                return "quarantined" if i == len(entries) - 1 else None
+            for target_file in target_files:
+                self.run_ornator(tree.map(target_file))
+        return "applied" if self.run_probator([tree.map(t) for t in entries[-1][1]]) else "reverted"
+
+    def serve(self, tree, patch_path, target_files, expected):
+        """
+        Copies a verified patch's targets from its scratch tree into the
+        project, unless someone else changed them since they were read.
+        expected maps each target to the content it should have now.
+        """
+        if any(self.snapshot(t) != expected[t] for t in target_files):
+            return False
+        self.note("begin", patch_path)
+        with self.stage("serve"):
+            for target_file in target_files:
+                content = self.snapshot(tree.map(target_file))
+                write_atomically(target_file, content, backup=target_file + BACKUP_SUFFIX)
+                expected[target_file] = content
+        self.note("done", patch_path, "applied")
+        for backup in self.backup_paths(target_files).values():
+            if os.path.exists(backup):
+                os.remove(backup)
+        os.remove(patch_path)
+        logging.info(f"Operarius: Mutatis mutandis. '{os.path.basename(patch_path)}' verified in scratch and served.")
+        return True
+
+    @staticmethod
+    def snapshot(path):
+        try:
+            with open(path, 'r', newline='') as f:
+                return f.read()
+        except (OSError, UnicodeDecodeError):
+            return None
+
+    def restore_backups(self, backups):
+        for target_file, backup in backups.items():
+            if os.path.exists(backup) and not os.path.samefile(backup, target_file):
+                shutil.copy(backup, target_file)
+
+    def revert_and_quarantine(self, backups, patch, outcome="reverted"):
+        try:
+            for target_file, backup in backups.items():
+                if os.path.exists(backup):
+                    shutil.move(backup, os.path.realpath(target_file))
+            self.quarantine(patch, outcome)
             logging.info("Probator: Reversion successful.")
         except Exception as e:
             logging.critical(f"PROBATOR: CRITICAL FAILURE. Could not restore backup. Error: {e}")
-    def quarantine(self, patch_path):
+    def quarantine(self, patch_path, outcome="quarantined"):
+        """Moves a patch aside. outcome is 'reverted' when it was applied and then undone."""
         if os.path.exists(patch_path):
             shutil.move(patch_path, os.path.join(QUARANTINE_DIR, os.path.basename(patch_path)))
+            self.note("done", patch_path, outcome)
     def run_ornator(self, target_file):
-        if not target_file.endswith('.py'):
-            logging.info(f"Ornator: Skipping non-Python file.")
-            return
-        logging.info(f"Ornator: Formatting '{os.path.basename(target_file)}'...")
-        try:
-            venv_bin_dir = os.path.dirname(sys.executable)
-            black_path = os.path.join(venv_bin_dir, "black")
-            ruff_path = os.path.join(venv_bin_dir, "ruff")
-            subprocess.run([black_path, target_file], check=True, capture_output=True, text=True)
-            subprocess.run([ruff_path, "check", "--fix", target_file], check=True, capture_output=True, text=True)
-            logging.info("Ornator: Formatting complete.")
-        except Exception as e:
-            logging.warning(f"Ornator: Formatting failed. Details: {e}")
+        with self.stage("ornator"):
+            orna(target_file)
 
 class PatchHandler(FileSystemEventHandler):
-    def __init__(self, work_queue):
+    """
+    Hands a patch to the dispatcher only once its writer is done with it:
+    on close-after-write (inotify), on an atomic rename into the inbox, or,
+    where neither event exists, once the file has stopped changing for a
+    quiet period proportional to how long it has been written to.
+    Duplicate events for the same file contents are dropped.
+    """
+    SETTLE_MIN = 0.02  # seconds
+    SETTLE_MAX = 1.0
+    # When the observer reports close-after-write, polling is only a backstop
+    # for files moved in from outside the inbox, which produce no close event.
+    CLOSE_BACKSTOP = 5.0
+    # An empty file, however it was reported, is only submitted once it has
+    # stayed empty this long, so that the Operarius quarantines it instead of
+    # it being polled forever.
+    EMPTY_PATIENCE = 60.0
+
+    def __init__(self, dispatcher, reports_close=False):
         super().__init__()
-        self.work_queue = work_queue
+        self.dispatcher = dispatcher
+        self.min_quiet = self.CLOSE_BACKSTOP if reports_close else self.SETTLE_MIN
+        self.lock = threading.Lock()
+        self.watching = {}   # path -> settle Timer
+        self.submitted = {}  # path -> (inode, size, mtime_ns) last handed to the dispatcher
+
+    @staticmethod
+    def is_patch(path):
+        return path.endswith(".patch")
+
     def on_created(self, event):
-        if not event.is_directory and event.src_path.endswith(".patch"):
-            logging.info(f"Speculator: Detected new patch -> {os.path.basename(event.src_path)}")
-            self.work_queue.put(event.src_path)
+        if not event.is_directory and self.is_patch(event.src_path):
+            self.watch(event.src_path)
+    def on_modified(self, event):
+        if not event.is_directory and self.is_patch(event.src_path):
+            self.watch(event.src_path)
+    def on_closed(self, event):
+        if not event.is_directory and self.is_patch(event.src_path):
+            self.submit(event.src_path)
+    def on_moved(self, event):
+        if not event.is_directory and self.is_patch(event.dest_path):
+            self.submit(event.dest_path)
+
+    def watch(self, path):
+        with self.lock:
+            if path in self.watching:
+                return
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                return
+            self.schedule(path, time.monotonic(), (st.st_size, st.st_mtime_ns), self.min_quiet)
+
+    def schedule(self, path, first_seen, last, delay):
+        timer = threading.Timer(delay, self.settle, args=(path, first_seen, last))
+        timer.daemon = True
+        self.watching[path] = timer
+        timer.start()
+
+    def settle(self, path, first_seen, last):
+        with self.lock:
+            if path not in self.watching:
+                return  # A close or rename event got there first.
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                del self.watching[path]
+                return
+            current = (st.st_size, st.st_mtime_ns)
+            abandoned = current == last and time.monotonic() - first_seen >= self.EMPTY_PATIENCE
+            if current != last or not (st.st_size or abandoned):
+                # Still being written: wait about half as long as it has been active so far.
+                delay = max(self.min_quiet, min(self.SETTLE_MAX, (time.monotonic() - first_seen) / 2))
+                self.schedule(path, first_seen, current, delay)
+                return
+        self.submit(path, settled=True)
+
+    def submit(self, path, settled=False):
+        with self.lock:
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                st = None
+            if st is not None and not st.st_size and not settled:
+                # Closed before anything was written (e.g. 'touch'): wait for content like the polling path does.
+                if path not in self.watching:
+                    self.schedule(path, time.monotonic(), (st.st_size, st.st_mtime_ns), self.min_quiet)
+                return
+            timer = self.watching.pop(path, None)
+            if timer:
+                timer.cancel()
+            if st is None:
+                return
+            signature = (st.st_ino, st.st_size, st.st_mtime_ns)
+            if self.submitted.get(path) == signature:
+                return
+            if len(self.submitted) > 1024:
+                self.submitted = {p: sig for p, sig in self.submitted.items() if os.path.exists(p)}
+            self.submitted[path] = signature
+        logging.info(f"Speculator: Detected new patch -> {os.path.basename(path)}")
+        self.dispatcher.put(path)
+
+class RootWatcher(FileSystemEventHandler):
+    """
+    Keeps the shared project-root cache honest: watches (non-recursively)
+    every directory a root lookup has walked through, and invalidates the
+    cache when a root marker or project config file appears, disappears
+    or changes there.
+    """
+    def __init__(self, observer):
+        super().__init__()
+        self.observer = observer
+        self.watched = set()
+        self.lock = threading.Lock()
+
+    def watch(self, directories):
+        with self.lock:
+            for directory in directories:
+                if directory in self.watched:
+                    continue
+                self.watched.add(directory)
+                try:
+                    self.observer.schedule(self, directory, recursive=False)
+                except Exception as e:
+                    logging.debug(f"Speculator: Cannot watch '{directory}' for root changes: {e}")
+
+    def on_any_event(self, event):
+        for path in (event.src_path, getattr(event, 'dest_path', '')):
+            if not path:
+                continue
+            name = os.path.basename(path)
+            if name in ROOT_MARKERS and event.event_type in ('created', 'deleted', 'moved'):
+                ROOT_CACHE.invalidate(os.path.dirname(path))
+            elif name in CONFIG_FILES and event.event_type != 'opened' and not event.event_type.startswith('closed_no'):
+                ROOT_CACHE.forget_info(os.path.dirname(path))
 
 # The @app.callback() makes this function run automatically
 # when the user types 'scriptor speculator'. No 'start' needed.
 @app.callback(invoke_without_command=True)
-def run_daemon():
+def run_daemon(
+    workers: int = typer.Option(1, "--workers", "-w", min=1, help="Number of Operarius workers. Patches for different project roots run concurrently."),
+    impacted: bool = typer.Option(False, "--impacted", help="Run only the tests that import the patched module."),
+    full_run_every: int = typer.Option(probator_tool.FULL_RUN_INTERVAL, "--full-run-every", min=0, help="With --impacted, seconds between scheduled full test runs per project."),
+    warm: bool = typer.Option(False, "--warm", help="Keep a warm, forking pytest process per project instead of starting pytest for every patch."),
+    coalesce: bool = typer.Option(False, "--coalesce", help="Apply every queued patch for a project together and verify them with one test run."),
+    metrics: str = typer.Option(None, "--metrics", help="Serve Prometheus metrics on PORT, HOST:PORT or unix:/path/to/socket."),
+    scratch: int = typer.Option(0, "--scratch", min=0, help="Verify up to N queued patches per project in parallel scratch trees; only verified results reach the project. Tests that rewrite .py sources in place or run git still reach the real project.")
+):
     """
     Starts the Speculator daemon.
     """
+    os.makedirs(SCRIBO_INBOX, exist_ok=True); os.makedirs(QUARANTINE_DIR, exist_ok=True)
     setup_logging()
+    setup_spans(SCRIBO_INBOX)
     logging.info("--- Speculator v3.1 ---")
-    os.makedirs(SCRIBO_INBOX, exist_ok=True); os.makedirs(QUARANTINE_DIR, exist_ok=True)
-    work_queue = queue.Queue(); worker = Operarius(work_queue); worker.start()
-    event_handler = PatchHandler(work_queue); observer = Observer()
+    journal = Tabularium(SCRIBO_INBOX)
+    pending = recover(journal)
+    if impacted:
+        probator_tool.FULL_RUN_INTERVAL = full_run_every
+        if hasattr(signal, 'SIGUSR1'):
+            # On-demand full run: `systemctl --user kill -s USR1 scriptor.service`
+            signal.signal(signal.SIGUSR1, lambda signum, frame: probator_tool.request_full_run())
+        logging.info(f"Probator: Impacted-tests mode. Full suite every {full_run_every}s or on SIGUSR1.")
+    dispatcher = Dispatcher(journal=journal)
+    METRICS.gauge("scriptor_queue_depth", "Patches queued or in flight across all project lanes.", dispatcher.depth)
+    if metrics:
+        try:
+            serve_metrics(metrics)
+        except (ValueError, OSError) as e:
+            logging.error(f"Mensura: Cannot serve metrics on '{metrics}': {e}")
+            acta.stop()  # Flush the queued record before exiting.
+            raise typer.Exit(code=1)
+        logging.info(f"Mensura: Serving metrics on {metrics}.")
+    if scratch and coalesce:
+        logging.warning("Speculator: --scratch takes precedence over --coalesce.")
+    pool = [Operarius(dispatcher, name=f"Operarius-{i + 1}", impacted=impacted, warm=warm, coalesce=coalesce, scratch=scratch) for i in range(workers)]
+    for worker in pool: worker.start()
+    logging.info(f"Speculator: {workers} Operarius worker(s) online.")
+    observer = Observer()
+    event_handler = PatchHandler(dispatcher, reports_close=type(observer).__name__ == "InotifyObserver")
+    root_watcher = RootWatcher(observer)
+    ROOT_CACHE.listeners.append(root_watcher.watch)
     observer.schedule(event_handler, SCRIBO_INBOX, recursive=False); observer.start()
+    if pending:
+        logging.info(f"Speculator: Resuming {len(pending)} patch(es) found in the inbox at startup.")
+    for patch_path in pending:
+        event_handler.submit(patch_path)
     logging.info(f"System online. Observing for patch files in: {SCRIBO_INBOX}")
     try:
         while True: time.sleep(1)
     except KeyboardInterrupt:
-        logging.info("Shutdown signal received. Cleaning up."); observer.stop(); work_queue.put(None)
-    observer.join(); worker.join(); logging.info("Speculator stopped.")
+        logging.info("Shutdown signal received. Cleaning up."); observer.stop(); dispatcher.stop(len(pool))
+    observer.join()
+    for worker in pool: worker.join()
+    probator_tool.stop_warm_runners()
+    logging.info("Speculator stopped.")
+    acta.stop()
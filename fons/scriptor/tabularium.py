@@ -0,0 +1,106 @@
+import os
+import json
+import time
+import logging
+import threading
+from .perfector import read_targets, BACKUP_SUFFIX
+
+JOURNAL_NAME = ".speculator_journal"
+
+class Tabularium:
+    """
+    The speculator's durable work journal: an append-only JSON-lines file in
+    the inbox recording when each patch was queued, when an Operarius began
+    it, and how it ended. After a crash or restart, replaying the journal
+    tells the daemon which patches were mid-flight (their targets may hold
+    a half-verified change) and in what order the rest were queued.
+
+        {"op": "queued", "patch": "20250101-120000-guide.patch", "ts": ...}
+        {"op": "begin",  "patch": "...", "ts": ...}
+        {"op": "done",   "patch": "...", "outcome": "applied", "ts": ...}
+    """
+    def __init__(self, inbox):
+        self.inbox = inbox
+        self.path = os.path.join(inbox, JOURNAL_NAME)
+        self.lock = threading.Lock()
+
+    def record(self, op, patch_path, outcome=None):
+        entry = {"op": op, "patch": os.path.basename(patch_path), "ts": time.time()}
+        if outcome:
+            entry["outcome"] = outcome
+        with self.lock:
+            with open(self.path, 'a') as f:
+                f.write(json.dumps(entry) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+    def replay(self):
+        """Returns {patch name: last entry}, in the order patches were first journaled."""
+        state = {}
+        if not os.path.exists(self.path):
+            return state
+        with open(self.path, 'r') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # A torn final line from a crash mid-write.
+                state.setdefault(entry["patch"], entry)
+                state[entry["patch"]] = entry
+        return state
+
+    def reset(self):
+        """Starts a fresh journal once recovery has dealt with the old one."""
+        with self.lock:
+            temp_path = self.path + ".tmp"
+            open(temp_path, 'w').close()
+            os.replace(temp_path, self.path)
+
+def recover(tabularium):
+    """
+    Makes the inbox consistent after an unclean stop and returns the patch
+    paths still to be processed, in their original queue order, followed
+    by any unjournaled patches in the inbox ordered by modification time.
+
+    A patch that was begun but never finished is resumed: its target is
+    restored from the '.scribo_bak' backup taken before it was applied,
+    and the patch is queued again. A patch that finished as 'applied' but
+    whose files were not yet cleaned up has its leftovers removed, unless
+    that backup restore just undid it, in which case it is queued again too.
+    """
+    state = tabularium.replay()
+    live = {}
+    for name, entry in state.items():
+        patch_path = os.path.join(tabularium.inbox, name)
+        if os.path.exists(patch_path):
+            live[name] = (entry, patch_path, read_targets(patch_path))
+    in_flight_targets = {target for entry, _, targets in live.values() if entry["op"] == "begin" for target in targets}
+    pending = []
+    for name, (entry, patch_path, target_files) in live.items():
+        if entry["op"] == "begin":
+            for target_file in target_files:
+                backup = target_file + BACKUP_SUFFIX
+                if os.path.exists(backup):
+                    os.replace(backup, os.path.realpath(target_file))
+                    logging.warning(f"Tabularium: Restored '{os.path.basename(target_file)}' from the backup of interrupted patch '{name}'.")
+            pending.append(patch_path)
+        elif entry["op"] == "queued":
+            pending.append(patch_path)
+        elif entry.get("outcome") == "applied":
+            if in_flight_targets.intersection(target_files):
+                pending.append(patch_path)
+                continue
+            for target_file in target_files:
+                if os.path.exists(target_file + BACKUP_SUFFIX):
+                    os.remove(target_file + BACKUP_SUFFIX)
+            os.remove(patch_path)
+            logging.info(f"Tabularium: Cleaned up after applied patch '{name}'.")
+    known = set(pending)
+    unjournaled = []
+    for name in os.listdir(tabularium.inbox):
+        patch_path = os.path.join(tabularium.inbox, name)
+        if name.endswith(".patch") and patch_path not in known and os.path.isfile(patch_path):
+            unjournaled.append((os.stat(patch_path).st_mtime_ns, name, patch_path))
+    pending.extend(patch_path for _, _, patch_path in sorted(unjournaled))
+    tabularium.reset()
+    return pending
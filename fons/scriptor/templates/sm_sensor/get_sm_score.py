@@ -8,7 +8,13 @@ import os
 import re
 import time
 import sys
+import signal
+import threading
 import socket
+import sqlite3
+import glob
+import argparse
+from collections import deque
 import requests
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
@@ -17,17 +23,52 @@ logging.basicConfig(filename='/tmp/sm_score_error.log', level=logging.WARNING, f
 CONFIG_FILE = '/tmp/sm_gpu_config.json'
 FAILURE_CACHE = '/tmp/sm_gpu_failure_cache.txt'
 DMESG_OOM_PATTERN = re.compile(r'Out of memory|oom-kill')
+KMSG_PATH = '/dev/kmsg'
+DMESG_STAMP = re.compile(r'^\[\s*(\d+\.\d+)\]')
+BOOT_ID_FILE = '/proc/sys/kernel/random/boot_id'
+# Where the kernel log reader persists its position and the OOM events it has seen.
+KERNEL_LOG_STATE = '/tmp/sm_kernel_log_state.json'
+JOURNAL_CURSOR_FILE = '/tmp/sm_journal_kernel.cursor'
+# An OOM event costs CRASH_PENALTY when it happens and half that CRASH_HALF_LIFE
+# seconds later; events older than CRASH_MEMORY no longer count at all.
+CRASH_PENALTY = 50
+CRASH_HALF_LIFE = 600
+CRASH_MEMORY = 6 * 3600
 LAST_ALERT_FILE = '/home/isidore/system_maneuverability/sm_alert_cooldown.txt'
 ALERT_COOLDOWN = 3600
+# Agent mode (--daemon) writes what log_sm_score.sh writes from cron.
+HISTORY_FILE = os.path.expanduser('~/.sm_history.log')
+STATUS_FILE = '/tmp/sm_status.json'
+HISTORY_SECONDS = 7 * 86400  # The cron script's 10080 one-minute lines.
+DEFAULT_INTERVAL = 15
+# Every sample, with its per-component penalties, plus 1m and 1h score rollups.
+# 'scriptor praetor scores' pulls new samples from here; keep the path in sync.
+SCORE_DB = '/home/isidore/system_maneuverability/sm_scores.db'
+RETENTION = {'samples': 7 * 86400, 'rollup_1m': 30 * 86400, 'rollup_1h': 400 * 86400}
+# Root of the sysfs tree the GPU backends read; point it at a fake tree to test without a GPU.
+SYSFS_ROOT = os.environ.get('SM_SYSFS_ROOT', '/sys')
 
-training_mode = len(sys.argv) > 1 and sys.argv[1] == '--training'
-
+training_mode = False
 gpu_tool = 'none'
-if os.path.exists(CONFIG_FILE):
+_config_mtime = None
+
+def load_gpu_config():
+    """(Re)reads the GPU tool from CONFIG_FILE, but only when the file has changed."""
+    global gpu_tool, _config_mtime
+    try:
+        mtime = os.stat(CONFIG_FILE).st_mtime_ns
+    except OSError:
+        return
+    if mtime == _config_mtime:
+        return
+    _config_mtime = mtime
     try:
         with open(CONFIG_FILE, 'r') as f:
             config = json.load(f)
-        gpu_tool = config.get('gpu_tool', 'none')
+        tool = config.get('gpu_tool', 'none')
+        if tool != gpu_tool:
+            reset_gpu_backend()
+        gpu_tool = tool
         logging.info(f"Using GPU tool: {gpu_tool}")
     except Exception as e:
         logging.warning(f"Failed to read GPU config: {e}")
@@ -51,10 +92,141 @@ def log_failure(tool, message):
         with open(FAILURE_CACHE, 'w') as f:
             f.write(f"{int(time.time())},{tool}")
 
+class GpuBackendUnavailable(Exception):
+    pass
+
+class NvmlBackend:
+    """NVIDIA, via NVML: device handles are opened once and queried in-process."""
+    name = 'nvml'
+
+    def __init__(self, sysfs_root=None):
+        try:
+            pynvml.nvmlInit()
+            self.handles = [pynvml.nvmlDeviceGetHandleByIndex(i) for i in range(pynvml.nvmlDeviceGetCount())]
+        except Exception as e:
+            raise GpuBackendUnavailable(f"NVML: {e}")
+        if not self.handles:
+            raise GpuBackendUnavailable("NVML: no devices")
+
+    def utilization(self):
+        return max(pynvml.nvmlDeviceGetUtilizationRates(h).gpu for h in self.handles)
+
+class AmdgpuBackend:
+    """AMD, via the amdgpu driver's gpu_busy_percent; the sysfs files are opened once and re-read with pread."""
+    name = 'amdgpu'
+
+    def __init__(self, sysfs_root=None):
+        paths = sorted(glob.glob(os.path.join(sysfs_root or SYSFS_ROOT, 'class/drm/card*/device/gpu_busy_percent')))
+        self.fds = []
+        for path in paths:
+            try:
+                self.fds.append(os.open(path, os.O_RDONLY))
+            except OSError:
+                continue
+        if not self.fds:
+            raise GpuBackendUnavailable("amdgpu: no readable gpu_busy_percent")
+
+    def utilization(self):
+        return max(int(os.pread(fd, 32, 0).strip() or 0) for fd in self.fds)
+
+class IntelBackend:
+    """
+    Intel (i915/xe), via sysfs RC6 residency: the share of wall time the GT
+    was not in its RC6 sleep state since the previous sample counts as busy.
+    That is the render-idle complement, not per-engine load, but it needs
+    neither root nor a PMU.
+    """
+    name = 'intel'
+    MIN_WINDOW_MS = 100
+
+    def __init__(self, sysfs_root=None):
+        root = sysfs_root or SYSFS_ROOT
+        self.paths = sorted(glob.glob(os.path.join(root, 'class/drm/card*/gt/gt*/rc6_residency_ms'))
+                            or glob.glob(os.path.join(root, 'class/drm/card*/power/rc6_residency_ms')))
+        if not self.paths:
+            raise GpuBackendUnavailable("intel: no rc6_residency_ms")
+        self.last = self.read()
+
+    def read(self):
+        readings = []
+        for path in self.paths:
+            with open(path, 'r') as f:
+                readings.append(int(f.read().strip()))
+        return time.monotonic(), readings
+
+    def utilization(self):
+        (then, before), (now, after) = self.last, self.read()
+        self.last = (now, after)
+        elapsed_ms = (now - then) * 1000
+        if elapsed_ms < self.MIN_WINDOW_MS:
+            return None  # Too short for a millisecond counter to say anything.
+        idle = [min(1.0, max(0.0, (b - a) / elapsed_ms)) for a, b in zip(before, after)]
+        return int(round(100 * (1 - min(idle))))
+
+class ToolBackend:
+    """Fallback: spawn the configured vendor tool on every sample."""
+    def __init__(self, tool):
+        self.name = tool
+
+    def utilization(self):
+        return run_gpu_tool(self.name)
+
+class NoGpuBackend:
+    name = 'none'
+
+    def utilization(self):
+        return 0
+
+# Native backend to try first for each gpu_tool that detect_gpu.sh can configure.
+NATIVE_BACKENDS = {'nvidia-smi': NvmlBackend, 'radeontop': AmdgpuBackend, 'intel_gpu_top': IntelBackend}
+
+def open_gpu_backend(tool, sysfs_root=None):
+    """
+    Returns the cheapest working backend for the configured tool: the
+    native reader for its vendor, else the tool itself. With no tool
+    configured, every native reader is tried in turn.
+    """
+    if tool in NATIVE_BACKENDS:
+        candidates = [NATIVE_BACKENDS[tool]]
+    elif tool == 'none':
+        candidates = [NvmlBackend, AmdgpuBackend, IntelBackend]
+    else:
+        candidates = []
+    for backend in candidates:
+        try:
+            opened = backend(sysfs_root)
+            logging.info(f"GPU backend: {opened.name}")
+            return opened
+        except GpuBackendUnavailable as e:
+            logging.info(f"GPU backend unavailable: {e}")
+    if tool in NATIVE_BACKENDS:
+        return ToolBackend(tool)
+    return NoGpuBackend()
+
+_gpu_backend = None
+
+def reset_gpu_backend():
+    global _gpu_backend
+    _gpu_backend = None
+
+def gpu_backend():
+    global _gpu_backend
+    if _gpu_backend is None:
+        _gpu_backend = open_gpu_backend(gpu_tool)
+    return _gpu_backend
+
 def get_gpu_utilization():
-    if gpu_tool == 'none':
+    backend = gpu_backend()
+    try:
+        utilization = backend.utilization()
+        return 0 if utilization is None else utilization
+    except Exception as e:
+        log_failure(backend.name, f"Error: {e}")
         return 0
-    if gpu_tool == 'radeontop':
+
+def run_gpu_tool(tool):
+    """The original sampling path: spawn the vendor tool and parse its output."""
+    if tool == 'radeontop':
         try:
             result = subprocess.run(['sudo', 'radeontop', '-d', '-', '-l', '1'], capture_output=True, text=True, check=True, timeout=5)
             for line in result.stdout.splitlines():
@@ -65,7 +237,7 @@ def get_gpu_utilization():
         except Exception as e:
             log_failure('radeontop', f"Error: {e}")
         return 0
-    elif gpu_tool == 'intel_gpu_top':
+    elif tool == 'intel_gpu_top':
         try:
             result = subprocess.run(['sudo', 'intel_gpu_top', '-s', '1', '-o', 'csv'], capture_output=True, text=True, check=True, timeout=5)
             for line in result.stdout.splitlines()[1:]:
@@ -76,7 +248,7 @@ def get_gpu_utilization():
         except Exception as e:
             log_failure('intel_gpu_top', f"Error: {e}")
         return 0
-    elif gpu_tool == 'nvidia-smi':
+    elif tool == 'nvidia-smi':
         try:
             result = subprocess.run(['nvidia-smi', '--query-gpu=utilization.gpu', '--format=csv,noheader'], capture_output=True, text=True, check=True)
             util = int(result.stdout.strip().replace('%', ''))
@@ -86,12 +258,20 @@ def get_gpu_utilization():
         return 0
     return 0
 
+_session = None
+
+def http_session():
+    """One pooled session per process, so the agent reuses its keep-alive connection."""
+    global _session
+    if _session is None:
+        _session = requests.Session()
+        retries = Retry(total=3, backoff_factor=0.1, status_forcelist=[500, 502, 503, 504])
+        _session.mount('http://', HTTPAdapter(max_retries=retries))
+    return _session
+
 def get_inference_rate():
-    session = requests.Session()
-    retries = Retry(total=3, backoff_factor=0.1, status_forcelist=[500, 502, 503, 504])
-    session.mount('http://', HTTPAdapter(max_retries=retries))
     try:
-        response = session.head('http://localhost:11434', timeout=5)
+        response = http_session().head('http://localhost:11434', timeout=5)
         if response.status_code == 200:
             return 1  # Server active
         return 0
@@ -116,26 +296,188 @@ def get_thermal_penalty():
         return ((high_temp - warn_temp) / (crit_temp - warn_temp)) * max_penalty
     return 0
 
+class KernelLog:
+    """
+    Incremental reader for OOM events in the kernel log. Reads /dev/kmsg
+    without blocking and skips records up to the sequence number persisted
+    in KERNEL_LOG_STATE; in agent mode the device stays open, so each
+    sample only sees records logged since the last one. Where /dev/kmsg is
+    not readable (dmesg_restrict=1), 'journalctl -k' with a cursor file is
+    used instead, which needs the adm or systemd-journal group; failing
+    that, 'sudo -n dmesg', which needs a passwordless sudo rule for dmesg.
+    """
+    def __init__(self, state_file=KERNEL_LOG_STATE, kmsg_path=KMSG_PATH):
+        self.state_file = state_file
+        self.kmsg_path = kmsg_path
+        self.fd = None
+        self.seq = -1
+        self.dmesg_stamp = -1.0  # seconds since boot of the last record read via dmesg
+        self.events = []  # wall-clock times of OOM events, oldest first
+        self.boot_id = self.read_boot_id()
+        try:
+            with open(self.state_file, 'r') as f:
+                state = json.load(f)
+            self.events = [float(t) for t in state.get('events', [])]
+            if state.get('boot_id') == self.boot_id:
+                self.seq = int(state.get('seq', -1))  # Sequence numbers restart at boot.
+                self.dmesg_stamp = float(state.get('dmesg_stamp', -1.0))
+        except (OSError, ValueError, TypeError):
+            pass
+
+    @staticmethod
+    def read_boot_id():
+        try:
+            with open(BOOT_ID_FILE, 'r') as f:
+                return f.read().strip()
+        except OSError:
+            return None
+
+    def save(self):
+        state = {'boot_id': self.boot_id, 'seq': self.seq, 'dmesg_stamp': self.dmesg_stamp, 'events': self.events}
+        write_atomically(self.state_file, json.dumps(state))
+
+    def read_kmsg(self):
+        """Returns wall-clock times of new OOM records, or None if /dev/kmsg is unusable."""
+        if self.fd is None:
+            try:
+                self.fd = os.open(self.kmsg_path, os.O_RDONLY | os.O_NONBLOCK)
+            except OSError:
+                return None
+        found = []
+        now, uptime = time.time(), time.clock_gettime(time.CLOCK_BOOTTIME)
+        while True:
+            try:
+                record = os.read(self.fd, 8192)
+            except BlockingIOError:
+                break  # Caught up.
+            except BrokenPipeError:
+                continue  # Records were overwritten before we read them; carry on with the oldest left.
+            except OSError:
+                os.close(self.fd)
+                self.fd = None
+                return None
+            if not record:
+                break
+            header, _, message = record.decode('utf-8', 'replace').partition(';')
+            fields = header.split(',')
+            try:
+                seq, usec = int(fields[1]), int(fields[2])
+            except (IndexError, ValueError):
+                continue
+            if seq <= self.seq:
+                continue
+            self.seq = seq
+            if DMESG_OOM_PATTERN.search(message.split('\n', 1)[0]):
+                found.append(now - (uptime - usec / 1e6))
+        return found
+
+    def read_journal(self):
+        """Returns wall-clock times of new OOM records via journalctl, or None if it is unusable."""
+        command = ['journalctl', '-k', '-q', '--no-pager', '-o', 'short-unix', f'--cursor-file={JOURNAL_CURSOR_FILE}']
+        if not os.path.exists(JOURNAL_CURSOR_FILE):
+            command.append(f'--since=-{CRASH_MEMORY}s')  # Older events would not count; skip past boots.
+        try:
+            result = subprocess.run(command, capture_output=True, text=True, timeout=10)
+        except (OSError, subprocess.TimeoutExpired):
+            return None
+        if result.returncode != 0:
+            return None
+        found = []
+        for line in result.stdout.splitlines():
+            if DMESG_OOM_PATTERN.search(line):
+                try:
+                    found.append(float(line.split(' ', 1)[0]))
+                except ValueError:
+                    found.append(time.time())
+        return found
+
+    def read_dmesg(self):
+        """Returns wall-clock times of new OOM records via 'sudo -n dmesg', or None if it is unusable."""
+        try:
+            result = subprocess.run(['sudo', '-n', 'dmesg'], capture_output=True, text=True, timeout=10)
+        except (OSError, subprocess.TimeoutExpired):
+            return None
+        if result.returncode != 0:
+            return None
+        found = []
+        now, uptime = time.time(), time.clock_gettime(time.CLOCK_BOOTTIME)
+        for line in result.stdout.splitlines():
+            match = DMESG_STAMP.match(line)
+            if not match or float(match.group(1)) <= self.dmesg_stamp:
+                continue
+            self.dmesg_stamp = float(match.group(1))
+            if DMESG_OOM_PATTERN.search(line):
+                found.append(now - (uptime - self.dmesg_stamp))
+        return found
+
+    def new_oom_events(self):
+        found = self.read_kmsg()
+        if found is None:
+            found = self.read_journal()
+        if found is None:
+            found = self.read_dmesg()
+        if found is None:
+            log_failure('kernel-log', "None of /dev/kmsg, 'journalctl -k' (needs the adm or systemd-journal group) "
+                                      "or 'sudo -n dmesg' is readable; crash penalty disabled")
+            return []
+        if found:
+            logging.warning(f"Detected {len(found)} new OOM event(s) in the kernel log")
+        return found
+
+    def crash_penalty(self):
+        """Sums each OOM event's penalty, halving every CRASH_HALF_LIFE seconds, capped at CRASH_PENALTY."""
+        now = time.time()
+        self.events = [t for t in self.events + self.new_oom_events() if now - t < CRASH_MEMORY]
+        self.events.sort()
+        self.save()
+        penalty = sum(CRASH_PENALTY * 0.5 ** (max(0.0, now - t) / CRASH_HALF_LIFE) for t in self.events)
+        return min(CRASH_PENALTY, penalty)
+
+_kernel_log = None
+
 def detect_crash_penalty():
+    global _kernel_log
+    if _kernel_log is None:
+        _kernel_log = KernelLog()
     try:
-        dmesg = subprocess.run(['sudo', 'dmesg', '-T'], capture_output=True, text=True).stdout
-        if DMESG_OOM_PATTERN.search(dmesg[-2000:]):
-            logging.warning("Detected potential OOM/crash")
-            return 50
-    except Exception:
-        pass
-    return 0
+        return _kernel_log.crash_penalty()
+    except Exception as e:
+        log_failure('kernel-log', f"Crash penalty failed: {e}")
+        return 0
+
+class CpuSampler:
+    """
+    CPU and iowait percentages from the difference between successive
+    psutil.cpu_times() readings. In agent mode the previous reading is the
+    last sample's, so nothing sleeps; a one-shot run measures one window.
+    """
+    def __init__(self):
+        self.last = psutil.cpu_times()
 
-def calculate_sm_score():
+    def sample(self):
+        current = psutil.cpu_times()
+        deltas = {field: max(0.0, getattr(current, field) - getattr(self.last, field)) for field in current._fields}
+        self.last = current
+        # guest time is already included in user/nice.
+        total = sum(v for k, v in deltas.items() if k not in ('guest', 'guest_nice'))
+        if total <= 0:
+            return 0.0, 0.0
+        idle = deltas.get('idle', 0.0) + deltas.get('iowait', 0.0)
+        return round(100 * (total - idle) / total, 1), round(100 * deltas.get('iowait', 0.0) / total, 1)
+
+def calculate_sm_score(sampler=None):
     score = 100
     penalties = {}
-    cpu_util = psutil.cpu_percent(interval=2)
+    if sampler is None:
+        sampler = CpuSampler()
+        gpu_backend()  # Opened (and, for Intel, primed) before the window.
+        time.sleep(2)  # One window for both CPU and iowait (previously two, back to back).
+    cpu_util, iowait = sampler.sample()
     penalties['cpu'] = (cpu_util / 100) * 30
     penalties['gpu'] = (get_gpu_utilization() / 100) * 30
     swap = psutil.swap_memory()
     penalties['memory_swap'] = (swap.percent / 100) * 5 if swap.percent > 80 else 0
     penalties['thermal'] = get_thermal_penalty()
-    iowait = psutil.cpu_times_percent(interval=2).iowait
     penalties['iowait'] = (iowait / 100) * 20
     mem_util = psutil.virtual_memory().percent
     penalties['memory_util'] = ((mem_util - 80.0) / 20.0) * 10 if mem_util > 80.0 else 0
@@ -151,7 +493,9 @@ def calculate_sm_score():
     total_penalty = sum(penalties.values())
     final_score = int(max(0, score - total_penalty))
     
-    logging.warning(f"SM Score: {final_score}, CPU Util: {cpu_util}%, Mem Util: {mem_util}%, IOWait: {iowait}%, Swap: {swap.percent}%, Net Bytes: {net_bytes}, Inference Rate: {inference_rate}, Penalties: {penalties}")
+    record_sample(final_score, {'cpu': cpu_util, 'mem': mem_util, 'iowait': iowait, 'swap': swap.percent,
+                                'net_bytes': net_bytes, 'inference': inference_rate}, penalties)
+    logging.info(f"SM Score: {final_score}, CPU Util: {cpu_util}%, Mem Util: {mem_util}%, IOWait: {iowait}%, Swap: {swap.percent}%, Net Bytes: {net_bytes}, Inference Rate: {inference_rate}, Penalties: {penalties}")
     
     if final_score < 20:
         try:
@@ -173,5 +517,149 @@ def calculate_sm_score():
     logging.info(f"SM Score: {final_score}, Penalties: {penalties}, Training Mode: {training_mode}")
     return final_score
 
+class ScoreStore:
+    """
+    SQLite time series of SM scores. Raw samples keep their metrics and
+    penalties; the 1m and 1h rollup tables keep count/sum/min/max of the
+    score per bucket, updated on every insert. Old rows are pruned once an
+    hour according to RETENTION.
+    """
+    def __init__(self, path=SCORE_DB):
+        self.db = sqlite3.connect(path, timeout=5)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS samples (
+                ts REAL PRIMARY KEY, score INTEGER, cpu REAL, mem REAL, iowait REAL,
+                swap REAL, net_bytes INTEGER, inference INTEGER, penalties TEXT);
+            CREATE TABLE IF NOT EXISTS rollup_1m (
+                bucket INTEGER PRIMARY KEY, count INTEGER, score_sum INTEGER, score_min INTEGER, score_max INTEGER);
+            CREATE TABLE IF NOT EXISTS rollup_1h (
+                bucket INTEGER PRIMARY KEY, count INTEGER, score_sum INTEGER, score_min INTEGER, score_max INTEGER);
+        """)
+        self.pruned_hour = None
+
+    def record(self, ts, score, metrics, penalties):
+        with self.db:
+            self.db.execute("INSERT OR REPLACE INTO samples VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                            (ts, score, metrics['cpu'], metrics['mem'], metrics['iowait'], metrics['swap'],
+                             metrics['net_bytes'], metrics['inference'],
+                             json.dumps({k: round(v, 2) for k, v in penalties.items()})))
+            for table, width in (('rollup_1m', 60), ('rollup_1h', 3600)):
+                self.db.execute(f"""
+                    INSERT INTO {table} VALUES (?, 1, ?, ?, ?)
+                    ON CONFLICT(bucket) DO UPDATE SET count = count + 1, score_sum = score_sum + excluded.score_sum,
+                        score_min = min(score_min, excluded.score_min), score_max = max(score_max, excluded.score_max)
+                """, (int(ts // width * width), score, score, score))
+            hour = int(ts // 3600)
+            if hour != self.pruned_hour:
+                self.pruned_hour = hour
+                self.db.execute("DELETE FROM samples WHERE ts < ?", (ts - RETENTION['samples'],))
+                self.db.execute("DELETE FROM rollup_1m WHERE bucket < ?", (ts - RETENTION['rollup_1m'],))
+                self.db.execute("DELETE FROM rollup_1h WHERE bucket < ?", (ts - RETENTION['rollup_1h'],))
+
+_score_store = None
+
+def record_sample(score, metrics, penalties):
+    global _score_store
+    try:
+        if _score_store is None:
+            _score_store = ScoreStore()
+        _score_store.record(time.time(), score, metrics, penalties)
+    except Exception as e:
+        log_failure('score-store', f"Could not record the sample in {SCORE_DB}: {e}")
+
+def write_atomically(path, content):
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, 'w') as f:
+        f.write(content)
+    os.chmod(temp_path, 0o644)
+    os.replace(temp_path, path)
+
+class SensorAgent:
+    """
+    Long-running sensor: samples every `interval` seconds with its imports,
+    HTTP session and CPU counters kept resident, and maintains the history
+    and status files that log_sm_score.sh would otherwise write from cron.
+    """
+    def __init__(self, interval=DEFAULT_INTERVAL, history_file=HISTORY_FILE, status_file=STATUS_FILE):
+        self.interval = interval
+        self.history_file = history_file
+        self.status_file = status_file
+        self.history = deque()  # (timestamp, score), oldest first
+        self.total = 0
+        self.stopping = threading.Event()
+        self.load_history()
+
+    def load_history(self):
+        cutoff = time.time() - HISTORY_SECONDS
+        try:
+            with open(self.history_file, 'r') as f:
+                for line in f:
+                    try:
+                        timestamp, score = (int(field) for field in line.strip().split(','))
+                    except ValueError:
+                        continue
+                    if timestamp >= cutoff:
+                        self.history.append((timestamp, score))
+                        self.total += score
+        except OSError:
+            pass
+        self.rewrite_history()
+
+    def rewrite_history(self):
+        write_atomically(self.history_file, "".join(f"{t},{s}\n" for t, s in self.history))
+
+    def record(self, score):
+        now = int(time.time())
+        self.history.append((now, score))
+        self.total += score
+        with open(self.history_file, 'a') as f:
+            f.write(f"{now},{score}\n")
+        cutoff = now - HISTORY_SECONDS
+        expired = 0
+        while self.history and self.history[0][0] < cutoff:
+            self.total -= self.history.popleft()[1]
+            expired += 1
+        if expired:
+            self.rewrite_history()
+        average = self.total // len(self.history)
+        write_atomically(self.status_file, json.dumps({"current": str(score), "average": str(average)}) + "\n")
+
+    def stop(self, signum=None, frame=None):
+        self.stopping.set()
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        sampler = CpuSampler()
+        load_gpu_config()
+        gpu_backend()  # Opened (and, for Intel, primed) before the first window.
+        next_sample = time.monotonic() + min(self.interval, 2)  # A first window, then the cadence.
+        while not self.stopping.wait(max(0.0, next_sample - time.monotonic())):
+            # Skip missed slots rather than sampling back to back after a stall.
+            next_sample = max(next_sample + self.interval, time.monotonic())
+            try:
+                self.record(calculate_sm_score(sampler))
+            except Exception as e:
+                logging.warning(f"Sensor agent sample failed: {e}")
+            # Pick up config changes now, so a new backend is primed before the next window.
+            load_gpu_config()
+            gpu_backend()
+
+def main():
+    global training_mode
+    parser = argparse.ArgumentParser(description="System Maneuverability score.")
+    parser.add_argument('--training', action='store_true', help="Halve every penalty.")
+    parser.add_argument('--daemon', action='store_true', help="Run as a resident agent writing the history and status files.")
+    parser.add_argument('--interval', type=float, default=DEFAULT_INTERVAL, help="Agent sampling interval in seconds.")
+    args = parser.parse_args()
+    training_mode = args.training
+    load_gpu_config()
+    if args.daemon:
+        SensorAgent(interval=max(1.0, args.interval)).run()
+    else:
+        print(calculate_sm_score())
+
 if __name__ == "__main__":
-    print(calculate_sm_score())
+    main()
@@ -0,0 +1,70 @@
+"""GPU backends of the SM sensor, read from fake sysfs trees instead of a GPU."""
+import os
+import importlib.util
+import pytest
+
+SENSOR = os.path.join(os.path.dirname(__file__), os.pardir, 'fons', 'scriptor', 'templates', 'sm_sensor', 'get_sm_score.py')
+spec = importlib.util.spec_from_file_location('get_sm_score', SENSOR)
+get_sm_score = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(get_sm_score)
+
+def write(root, relative, content):
+    path = root / relative
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(content)
+    return path
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(get_sm_score.time, 'monotonic', clock)
+    return clock
+
+def test_amdgpu_reports_the_busiest_card(tmp_path):
+    write(tmp_path, 'class/drm/card0/device/gpu_busy_percent', '12\n')
+    busy = write(tmp_path, 'class/drm/card1/device/gpu_busy_percent', '40\n')
+    backend = get_sm_score.AmdgpuBackend(str(tmp_path))
+    assert backend.utilization() == 40
+    busy.write_text('87\n')  # Re-read through the open descriptor.
+    assert backend.utilization() == 87
+
+def test_amdgpu_without_sysfs_files_is_unavailable(tmp_path):
+    with pytest.raises(get_sm_score.GpuBackendUnavailable):
+        get_sm_score.AmdgpuBackend(str(tmp_path))
+
+def test_intel_busy_is_the_rc6_complement_between_samples(tmp_path, clock):
+    rc6 = write(tmp_path, 'class/drm/card0/gt/gt0/rc6_residency_ms', '5000\n')
+    backend = get_sm_score.IntelBackend(str(tmp_path))
+    clock.now += 2.0
+    rc6.write_text('5500\n')  # Asleep for 500 of 2000 ms.
+    assert backend.utilization() == 75
+    clock.now += 1.0
+    rc6.write_text('6500\n')  # Asleep the whole second.
+    assert backend.utilization() == 0
+
+def test_intel_falls_back_to_the_card_power_counter(tmp_path, clock):
+    rc6 = write(tmp_path, 'class/drm/card0/power/rc6_residency_ms', '0\n')
+    backend = get_sm_score.IntelBackend(str(tmp_path))
+    clock.now += 1.0
+    rc6.write_text('900\n')
+    assert backend.utilization() == 10
+
+def test_intel_window_under_100ms_gives_no_reading(tmp_path, clock, monkeypatch):
+    rc6 = write(tmp_path, 'class/drm/card0/gt/gt0/rc6_residency_ms', '0\n')
+    backend = get_sm_score.IntelBackend(str(tmp_path))
+    monkeypatch.setattr(get_sm_score, '_gpu_backend', backend)
+    clock.now += 0.05
+    rc6.write_text('10\n')
+    assert backend.utilization() is None
+    clock.now += 0.05
+    assert get_sm_score.get_gpu_utilization() == 0  # The score counts no reading as idle.
+    clock.now += 1.0
+    rc6.write_text('510\n')  # Short samples still start the next window.
+    assert backend.utilization() == 50